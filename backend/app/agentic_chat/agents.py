@@ -1,8 +1,10 @@
 from crewai import Agent
-from .tools import rag_search
 from .llm import gemini_llm
 
-answer_agent = Agent(
+# Templates (kwargs) dos agentes: cada conversa monta suas próprias instâncias,
+# já que o crewai guarda estado de execução no Agent.
+
+_answer_template = dict(
     role="Tutor IA",
     goal="Responder dúvidas usando somente o material do curso",
     backstory=(
@@ -12,12 +14,13 @@ answer_agent = Agent(
         "Sempre em português brasileiro."
         "Foque atento às perguntas dos alunos e responda com clareza e precisão."
     ),
-    tools=[rag_search],
+    # sem tools: o contexto do RAG já vem na task (uma ida ao LLM)
+    tools=[],
     llm=gemini_llm,
     verbose=False,
 )
 
-insight_agent = Agent(
+_insight_template = dict(
     role="Anotador de Insights",
     goal="Classificar cada pergunta em tema e nível de dificuldade e salvar no banco",
     backstory=(
@@ -28,7 +31,7 @@ insight_agent = Agent(
     verbose=False,
 )
 
-summary_agent = Agent(
+_summary_template = dict(
     role="Resumidor de Conteúdo",
     goal="Criar mensagens resumidas e diretas baseadas em respostas completas",
     backstory=(
@@ -40,3 +43,13 @@ summary_agent = Agent(
     llm=gemini_llm,
     verbose=False,
 )
+
+AGENT_TEMPLATES = {
+    "answer": _answer_template,
+    "insight": _insight_template,
+    "summary": _summary_template,
+}
+
+
+def build_agent(kind: str) -> Agent:
+    return Agent(**AGENT_TEMPLATES[kind])
@@ -0,0 +1,108 @@
+# backend/app/agentic_chat/answer_cache.py
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+
+from services.embed import _EMBED
+from services.ingest import content_version
+
+SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.95"))
+MAX_ENTRIES_PER_COURSE = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "256"))
+ENTRY_TTL = float(os.getenv("CHAT_CACHE_TTL", "86400"))
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    result: tuple[str, Any, str]
+    version: int
+    latency: float
+    created: float = field(default_factory=time.monotonic)
+
+
+class SemanticAnswerCache:
+    """
+    Cache semântico de respostas por curso.
+
+    Uma pergunta nova reaproveita o (answer, insight, summary) de uma pergunta já
+    respondida quando a similaridade de cosseno entre os embeddings passa do
+    limiar e o conteúdo do curso não mudou desde então. A versão do conteúdo
+    (`version`) é lida antes do retrieval e passada a `lookup` e `store`: uma
+    resposta gerada enquanto uma ingestão terminava fica com a versão antiga.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES_PER_COURSE,
+        ttl: float = ENTRY_TTL,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries: dict[str, list[_Entry]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    async def embed(question: str) -> np.ndarray:
+        vec = np.asarray(await _EMBED.aembed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @staticmethod
+    def version(course_id: Any) -> int:
+        return content_version(str(course_id))
+
+    def lookup(self, course_id: Any, vector: np.ndarray, version: int) -> Optional[tuple[str, Any, str]]:
+        key = str(course_id)
+        now = time.monotonic()
+        with self._lock:
+            entries = [
+                e for e in self._entries.get(key, [])
+                if e.version == version and now - e.created <= self.ttl
+            ]
+            self._entries[key] = entries
+            best, best_score = None, -1.0
+            if entries:
+                scores = np.stack([e.vector for e in entries]) @ vector
+                idx = int(np.argmax(scores))
+                best, best_score = entries[idx], float(scores[idx])
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += best.latency
+            return best.result
+
+    def store(
+        self, course_id: Any, vector: np.ndarray, result: tuple[str, Any, str], latency: float, version: int
+    ):
+        key = str(course_id)
+        entry = _Entry(vector=vector, result=result, version=version, latency=latency)
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            entries.append(entry)
+            del entries[: -self.max_entries]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "courses": len(self._entries),
+                "entries": sum(len(v) for v in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "threshold": self.threshold,
+            }
+
+
+ANSWER_CACHE = SemanticAnswerCache()
@@ -1,59 +1,276 @@
 # backend/app/agentic_chat/crew.py
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
 from crewai import Crew, Process
-from .agents import answer_agent, insight_agent, summary_agent
-from . import tasks
+from services.llm_gateway import GATEWAY
+from .agents import AGENT_TEMPLATES, build_agent
+from .answer_cache import ANSWER_CACHE
+from .llm import gemini_llm
+from .tasks import TASK_TEMPLATES, build_task
+from .tools import retrieve_context
+
+# "parallel": insight em paralelo com busca+resposta e resumo logo após a resposta.
+# "combined": insight e resumo numa única chamada estruturada após a resposta.
+CHAT_MODE = os.getenv("CHAT_MODE", "parallel")
+CHAT_RAG_K = int(os.getenv("CHAT_RAG_K", "5"))
+
+
+@dataclass
+class ChatContext:
+    """Estado de uma conversa: reasoning, tempos (s) por etapa e o contexto usado."""
+
+    reasoning: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    context: dict = field(default_factory=dict)
+
 
-# Lista global para armazenar steps do reasoning
-_reasoning_steps = []
+# Cada request tem o seu contexto; os ramos do gather e as threads do crewai
+# herdam a mesma instância via contextvars.
+_current: ContextVar[ChatContext] = ContextVar("chat_context")
+
+
+def _context() -> ChatContext:
+    ctx = _current.get(None)
+    if ctx is None:
+        ctx = ChatContext()
+        _current.set(ctx)
+    return ctx
 
 def add_reasoning_step(step: str):
-    """Adiciona um step ao reasoning."""
-    global _reasoning_steps
-    _reasoning_steps.append(step)
+    """Adiciona um step ao reasoning da conversa atual."""
+    _context().reasoning.append(step)
 
 def get_reasoning_steps():
-    """Retorna e limpa os steps do reasoning."""
-    global _reasoning_steps
-    steps = _reasoning_steps.copy()
-    _reasoning_steps.clear()
+    """Retorna e limpa os steps do reasoning da conversa atual."""
+    ctx = _context()
+    steps = ctx.reasoning.copy()
+    ctx.reasoning.clear()
     return steps
 
 def clear_reasoning_steps():
-    """Limpa os steps do reasoning."""
-    global _reasoning_steps
-    _reasoning_steps.clear()
-
-tasks.task_answer.agent = answer_agent
-tasks.task_insight.agent = insight_agent
-tasks.task_summary.agent = summary_agent
-
-tasks.task_insight.context = [tasks.task_answer]
-tasks.task_summary.context = [tasks.task_answer]
-
-crew = Crew(
-    agents=[answer_agent, insight_agent, summary_agent],
-    tasks=[tasks.task_answer, tasks.task_insight, tasks.task_summary],
-    process=Process.sequential,   # answer ➜ insight ➜ summary
-    verbose=False,
-)
-
-async def run_chat(question: str):
-    """Executa fluxo completo e devolve (resposta, insight_dict, resumo)."""
-    # Limpar reasoning anterior
-    clear_reasoning_steps()
-    
+    """Limpa os steps do reasoning da conversa atual."""
+    _context().reasoning.clear()
+
+def get_timings():
+    """Retorna os tempos por etapa da conversa atual."""
+    return dict(_context().timings)
+
+def get_context_stats():
+    """Retorna tokens/trechos do contexto e as fontes citáveis da conversa atual."""
+    return dict(_context().context)
+
+
+def _crew(task: str, agent: str) -> Crew:
+    """Crew de um ramo com agente e task próprios, montados dos templates."""
+    member = build_agent(agent)
+    return Crew(
+        agents=[member],
+        tasks=[build_task(task, member)],
+        process=Process.sequential,
+        verbose=False,
+    )
+
+
+async def _kickoff(name: str, task: str, agent: str, inputs: dict):
+    ctx = _context()
+    started = time.perf_counter()
+    try:
+        return await _crew(task, agent).kickoff_async(inputs=inputs)
+    finally:
+        ctx.timings[name] = round(time.perf_counter() - started, 3)
+
+
+async def _retrieve(question: str, course_id) -> str:
+    ctx = _context()
+    started = time.perf_counter()
+    packed = await asyncio.to_thread(
+        retrieve_context, question, "" if course_id is None else str(course_id), CHAT_RAG_K
+    )
+    ctx.timings["retrieval"] = round(time.perf_counter() - started, 3)
+    ctx.context = {**packed.stats, "sources": packed.sources}
+    add_reasoning_step(
+        f"📚 {packed.stats.get('kept', 0)} trecho(s) do curso, ~{packed.stats.get('tokens_out', 0)} tokens de contexto"
+    )
+    return packed.text
+
+
+async def _answer(question: str, course_id) -> str:
+    context = await _retrieve(question, course_id)
+    output = await _kickoff("answer", "answer", "answer", {"question": question, "context": context})
+    add_reasoning_step("✅ Resposta gerada com sucesso")
+    return output.raw
+
+
+async def _answer_and_summary(question: str, course_id) -> tuple[str, str]:
+    answer = await _answer(question, course_id)
+    add_reasoning_step("📋 Gerando resumo da interação...")
+    output = await _kickoff("summary", "summary", "summary", {"answer": answer})
+    return answer, output.raw
+
+
+async def _insight(question: str) -> dict:
+    output = await _kickoff("insight", "insight", "insight", {"question": question})
+    add_reasoning_step("📊 Insights da pergunta classificados")
+    return output.json_dict
+
+
+async def run_chat(question: str, course_id=None):
+    """
+    Executa fluxo completo e devolve (resposta, insight_dict, resumo).
+    Reasoning e tempos ficam no contexto desta request (`get_reasoning_steps`,
+    `get_timings`), então conversas simultâneas não se misturam.
+    """
+    ctx = ChatContext()
+    _current.set(ctx)
+    started = time.perf_counter()
+
     # Adicionar steps do processo
     add_reasoning_step(f"🚀 Iniciando análise da pergunta: '{question[:100]}...'")
+
+    vector = version = None
+    if course_id is not None:
+        # versão lida antes do retrieval: o que for indexado depois não vale para esta resposta
+        version = ANSWER_CACHE.version(course_id)
+        vector = await ANSWER_CACHE.embed(question)
+        ctx.timings["cache"] = round(time.perf_counter() - started, 3)
+        cached = ANSWER_CACHE.lookup(course_id, vector, version)
+        if cached is not None:
+            add_reasoning_step("♻️ Pergunta semelhante já respondida neste curso; reaproveitando resposta")
+            add_reasoning_step("🎯 Processo concluído")
+            ctx.timings["total"] = round(time.perf_counter() - started, 3)
+            return cached
+
     add_reasoning_step("🤖 Ativando agente de resposta...")
-    
-    await crew.kickoff_async(inputs={"question": question})
-    
-    add_reasoning_step("✅ Resposta gerada com sucesso")
-    add_reasoning_step("📊 Analisando insights da pergunta...")
-    add_reasoning_step("📋 Gerando resumo da interação...")
+    llm_started = time.perf_counter()
+
+    if CHAT_MODE == "combined":
+        answer = await _answer(question, course_id)
+        add_reasoning_step("📊 Analisando insights e gerando resumo...")
+        output = await _kickoff(
+            "insight_summary", "insight_summary", "insight", {"question": question, "answer": answer}
+        )
+        data = output.json_dict or {}
+        insight = {"tema": data.get("tema"), "dificuldade": data.get("dificuldade")}
+        summary = data.get("resumo", "")
+    else:
+        add_reasoning_step("📊 Analisando insights da pergunta em paralelo...")
+        (answer, summary), insight = await asyncio.gather(
+            _answer_and_summary(question, course_id), _insight(question)
+        )
+
+    ctx.timings["total"] = round(time.perf_counter() - started, 3)
     add_reasoning_step("🎯 Processo concluído")
-    
-    answer = tasks.task_answer.output.raw
-    insight = tasks.task_insight.output.json_dict
-    summary = tasks.task_summary.output.raw
+    print(f"💬 Chat ({CHAT_MODE}) em {ctx.timings['total']}s: {ctx.timings}")
+
+    if vector is not None:
+        ANSWER_CACHE.store(
+            course_id, vector, (answer, insight, summary), time.perf_counter() - llm_started, version
+        )
     return answer, insight, summary
+
+
+def _answer_prompt(question: str, context: str) -> tuple[str, str]:
+    """(system, prompt) equivalentes ao agente/task de resposta, para chamar o LLM em stream."""
+    agent = AGENT_TEMPLATES["answer"]
+    task = TASK_TEMPLATES["answer"]
+    system = f"Você é {agent['role']}. {agent['backstory']}\nSeu objetivo: {agent['goal']}"
+    prompt = (
+        task["description"].format(question=question, context=context)
+        + f"\n\nResultado esperado: {task['expected_output']}"
+    )
+    return system, prompt
+
+
+async def stream_chat(question: str, course_id=None) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Versão em stream de `run_chat`: gera eventos (tipo, dados). Primeiro os
+    pedaços da resposta ("token"), depois "reasoning", "insight", "summary",
+    "context" (tokens e fontes citáveis) e "timings", que separa o tempo até o
+    primeiro token do tempo total.
+    """
+    ctx = ChatContext()
+    _current.set(ctx)
+    started = time.perf_counter()
+    add_reasoning_step(f"🚀 Iniciando análise da pergunta: '{question[:100]}...'")
+
+    def _finish_events(insight, summary):
+        ctx.timings["total"] = round(time.perf_counter() - started, 3)
+        add_reasoning_step("🎯 Processo concluído")
+        return [
+            ("reasoning", get_reasoning_steps()),
+            ("insight", insight),
+            ("summary", summary),
+            ("context", dict(ctx.context)),
+            ("timings", dict(ctx.timings)),
+        ]
+
+    vector = version = None
+    if course_id is not None:
+        # versão lida antes do retrieval: o que for indexado depois não vale para esta resposta
+        version = ANSWER_CACHE.version(course_id)
+        vector = await ANSWER_CACHE.embed(question)
+        ctx.timings["cache"] = round(time.perf_counter() - started, 3)
+        cached = ANSWER_CACHE.lookup(course_id, vector, version)
+        if cached is not None:
+            answer, insight, summary = cached
+            add_reasoning_step("♻️ Pergunta semelhante já respondida neste curso; reaproveitando resposta")
+            ctx.timings["first_token"] = round(time.perf_counter() - started, 3)
+            yield "token", answer
+            for event in _finish_events(insight, summary):
+                yield event
+            return
+
+    add_reasoning_step("🤖 Ativando agente de resposta...")
+    llm_started = time.perf_counter()
+    insight_task = None
+    if CHAT_MODE != "combined":
+        add_reasoning_step("📊 Analisando insights da pergunta em paralelo...")
+        insight_task = asyncio.create_task(_insight(question))
+
+    try:
+        context = await _retrieve(question, course_id)
+        system, prompt = _answer_prompt(question, context)
+        answer_started = time.perf_counter()
+        parts = []
+        async for text in GATEWAY.astream(
+            prompt, model=gemini_llm.model, system=system, **gemini_llm.generation_config()
+        ):
+            if not parts:
+                ctx.timings["first_token"] = round(time.perf_counter() - started, 3)
+            parts.append(text)
+            yield "token", text
+        answer = "".join(parts)
+        ctx.timings["answer"] = round(time.perf_counter() - answer_started, 3)
+        add_reasoning_step("✅ Resposta gerada com sucesso")
+
+        if insight_task is None:
+            add_reasoning_step("📊 Analisando insights e gerando resumo...")
+            output = await _kickoff(
+                "insight_summary", "insight_summary", "insight", {"question": question, "answer": answer}
+            )
+            data = output.json_dict or {}
+            insight = {"tema": data.get("tema"), "dificuldade": data.get("dificuldade")}
+            summary = data.get("resumo", "")
+        else:
+            add_reasoning_step("📋 Gerando resumo da interação...")
+            output = await _kickoff("summary", "summary", "summary", {"answer": answer})
+            summary = output.raw
+            insight = await insight_task
+    finally:
+        # cliente desconectou ou deu erro: não deixa o ramo de insight órfão
+        if insight_task is not None and not insight_task.done():
+            insight_task.cancel()
+
+    for event in _finish_events(insight, summary):
+        yield event
+    print(f"💬 Chat stream ({CHAT_MODE}) em {ctx.timings['total']}s: {ctx.timings}")
+
+    if vector is not None:
+        ANSWER_CACHE.store(
+            course_id, vector, (answer, insight, summary), time.perf_counter() - llm_started, version
+        )
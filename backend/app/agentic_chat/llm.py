@@ -1,11 +1,60 @@
 # backend/app/crew_chat/llm.py
 import os
-from crewai import LLM
-
-gemini_llm = LLM(
-    model="gemini/gemini-1.5-pro-latest",
-    api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.2,
-    max_tokens=2048,
-    stream=False
-)
+from typing import Any, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from services.llm_gateway import GATEWAY
+
+CHAT_MODEL = os.getenv("CHAT_LLM_MODEL", "models/gemini-1.5-pro-latest")
+
+
+class GatewayLLM(BaseLLM):
+    """
+    LLM do crewai que passa pelo gateway compartilhado, dividindo limites de
+    concorrência, retry e métricas com os agentes de shorts e threads.
+    """
+
+    def __init__(self, model: str, temperature: float = 0.2, max_tokens: int = 2048):
+        super().__init__(model=model, temperature=temperature)
+        self.max_tokens = max_tokens
+
+    @staticmethod
+    def _to_gemini(messages) -> tuple[Any, Optional[str]]:
+        """Mensagens no formato OpenAI → (contents do Gemini, system instruction)."""
+        if isinstance(messages, str):
+            return messages, None
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in messages
+            if m["role"] != "system"
+        ]
+        return contents, system
+
+    def generation_config(self) -> dict:
+        config = {"temperature": self.temperature, "max_output_tokens": self.max_tokens}
+        if self.stop:
+            config["stop_sequences"] = list(self.stop)[:5]  # limite da API
+        return config
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        contents, system = self._to_gemini(messages)
+        return GATEWAY.generate(contents, model=self.model, system=system, **self.generation_config())
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        contents, system = self._to_gemini(messages)
+        return await GATEWAY.agenerate(contents, model=self.model, system=system, **self.generation_config())
+
+    def supports_function_calling(self) -> bool:
+        # as tools seguem pelo formato ReAct (Action/Observation) do crewai
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+
+gemini_llm = GatewayLLM(CHAT_MODEL, temperature=0.2, max_tokens=2048)
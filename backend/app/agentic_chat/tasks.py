@@ -1,5 +1,5 @@
 # backend/app/crew_chat/tasks.py
-from crewai import Task
+from crewai import Agent, Task
 from pydantic import BaseModel
 
 class InsightJSON(BaseModel):
@@ -7,18 +7,30 @@ class InsightJSON(BaseModel):
     dificuldade: str
 
 
-task_answer = Task(
+class InsightSummaryJSON(BaseModel):
+    tema: str
+    dificuldade: str
+    resumo: str
+
+
+# Templates (kwargs) das tasks; `build_task` cria uma instância por conversa,
+# porque o crewai grava a saída e a descrição interpolada no próprio Task.
+
+# O contexto já chega recuperado (ver crew.run_chat): uma ida ao LLM por resposta.
+_answer_template = dict(
     description=(
-        "Use o tool `rag_search` para responder.\n"
-        "Exemplo: ```rag_search({\"question\":\"{question}\"})```"
+        "Responda à pergunta \"{question}\" usando somente o material do curso abaixo.\n"
+        "Se o material não cobrir a pergunta, diga isso. "
+        "Cite os trechos usados pelo número entre colchetes, como [1].\n\n"
+        "Material do curso:\n{context}"
     ),
-    required_inputs=["question"],
+    required_inputs=["question", "context"],
     expected_output="Resposta clara e concisa, citando fontes quando possível.",
     output_json=None,
 ) 
 
 
-task_insight = Task(
+_insight_template = dict(
     description=(
         "Para a pergunta \"{question}\" devolva SOMENTE JSON no formato "
         '{"tema":<str>,"dificuldade":<baixo|medio|alto>}'
@@ -28,13 +40,38 @@ task_insight = Task(
     output_json=InsightJSON,
 )
 
-task_summary = Task(
+_summary_template = dict(
     description=(
-        "Com base na resposta completa do agente anterior, "
+        "Com base na resposta completa abaixo, "
         "crie uma mensagem resumida de no máximo 2-3 frases que capture os pontos principais. "
-        "Seja direto, prático e use linguagem simples. "
-        "Analise o contexto das tasks anteriores para criar um resumo efetivo."
+        "Seja direto, prático e use linguagem simples.\n\n"
+        "Resposta:\n{answer}"
     ),
+    required_inputs=["answer"],
     expected_output="Resumo conciso e direto da resposta principal.",
     output_json=None,
-)
\ No newline at end of file
+)
+
+# Insight + resumo numa chamada só, depois da resposta (CHAT_MODE=combined).
+_insight_summary_template = dict(
+    description=(
+        "Para a pergunta \"{question}\" e a resposta abaixo, devolva SOMENTE JSON no formato "
+        '{"tema":<str>,"dificuldade":<baixo|medio|alto>,"resumo":<str>}, '
+        "onde resumo tem no máximo 2-3 frases diretas com os pontos principais.\n\n"
+        "Resposta:\n{answer}"
+    ),
+    required_inputs=["question", "answer"],
+    expected_output="JSON conforme schema",
+    output_json=InsightSummaryJSON,
+)
+
+TASK_TEMPLATES = {
+    "answer": _answer_template,
+    "insight": _insight_template,
+    "summary": _summary_template,
+    "insight_summary": _insight_summary_template,
+}
+
+
+def build_task(kind: str, agent: Agent) -> Task:
+    return Task(agent=agent, **TASK_TEMPLATES[kind])
@@ -1,21 +1,12 @@
-from crewai.tools import tool
-from services.embed import get_retriever
+from services.context_budget import PackedContext, pack_context
+from services.hybrid_search import HYBRID_TOP_K, hybrid_search
+from services.ingest import search_collection_for_course
 
-@tool("rag_search")
-def rag_search(question: str, k: int = 8) -> str:
-    """
-    Realiza busca semântica no banco de dados de conhecimento.
-    
-    Args:
-        question (str): A pergunta ou termo de busca
-        k (int): Número de documentos a retornar (padrão: 8)
-    
-    Returns:
-        str: Conteúdo dos documentos encontrados ou mensagem de erro
-    """
-    docs = get_retriever(k).invoke(question)
-    
-    if not docs:
-        return "⚠️ Nada encontrado no momento."
-    
-    return "\n\n---\n\n".join(d.page_content for d in docs)
\ No newline at end of file
+def retrieve_context(question: str, course_id: str = "", k: int = HYBRID_TOP_K) -> PackedContext:
+    """Busca híbrida nos trechos do curso e empacota no orçamento de tokens, com fontes."""
+    passages = hybrid_search(question, collection=search_collection_for_course(course_id), k=k)
+    packed = pack_context(passages, question)
+    if not packed.text:
+        packed.text = "⚠️ Nada encontrado no momento."
+    print(f"🔎 Contexto: {packed.stats}")
+    return packed
@@ -1,6 +1,12 @@
+import json
+
 from fastapi import APIRouter, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.agentic_chat.crew import run_chat, get_reasoning_steps
+from app.agentic_chat.crew import run_chat, get_context_stats, get_reasoning_steps, get_timings, stream_chat
+from app.agentic_chat.answer_cache import ANSWER_CACHE
+from services.embed_cache import QUERY_CACHE
+from services.llm_gateway import GATEWAY
 from typing import Dict, Any
 # from services.analytics import store_insight
 
@@ -12,12 +18,66 @@ class ChatIn(BaseModel):
 
 @router.post("/{course_id}/chat", status_code=status.HTTP_200_OK)
 async def chat(course_id: int, body: ChatIn) -> Dict[str, Any]:
-    answer, insight, summary = await run_chat(body.message)
+    answer, insight, summary = await run_chat(body.message, course_id=course_id)
     reasoning = get_reasoning_steps()  # Obter steps do reasoning
     # await store_insight(course_id, body.user_id, insight)
     return {
         "answer": answer, 
         "insight": insight, 
         "summary": summary,
-        "reasoning": reasoning
+        "reasoning": reasoning,
+        "timings": get_timings(),
+        "context": get_context_stats(),
     }
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _chat_events(course_id: int, message: str):
+    try:
+        async for event, data in stream_chat(message, course_id=course_id):
+            yield _sse(event, data)
+    except Exception as e:
+        print("❌ Erro no stream do chat:", e)
+        yield _sse("error", {"detail": str(e)})
+        return
+    yield _sse("done", {})
+
+
+def _stream_response(course_id: int, message: str) -> StreamingResponse:
+    """
+    Server-sent events: vários `token` com pedaços da resposta, depois
+    `reasoning`, `insight`, `summary`, `context` (tokens e fontes), `timings`
+    (first_token x total) e `done`.
+    """
+    return StreamingResponse(
+        _chat_events(course_id, message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{course_id}/stream")
+async def chat_stream(course_id: int, body: ChatIn) -> StreamingResponse:
+    return _stream_response(course_id, body.message)
+
+
+@router.get("/{course_id}/stream")
+async def chat_stream_get(course_id: int, message: str, user_id: int = 0) -> StreamingResponse:
+    # EventSource do navegador só faz GET
+    return _stream_response(course_id, message)
+
+
+@router.get("/cache/stats")
+async def chat_cache_stats() -> Dict[str, Any]:
+    return {
+        "answers": ANSWER_CACHE.stats(),
+        "query_embeddings": QUERY_CACHE.stats(),
+    }
+
+
+@router.get("/llm/stats")
+async def llm_stats() -> Dict[str, Any]:
+    return GATEWAY.stats()
@@ -6,9 +6,7 @@ from services.file_manager import list_files_by_course_or_lesson
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.database import SessionLocal
 
-import asyncio
-
-from services.ingest import process_and_index
+from services.ingest_jobs import get_job, retry_job, submit_job
 
 router = APIRouter()
 
@@ -17,7 +15,7 @@ async def get_db() -> AsyncSession:  # pragma: no cover
         yield session
 
 
-@router.post("/{course_id}/content", status_code=201)
+@router.post("/{course_id}/content", status_code=202)
 async def upload_contents(
     course_id: str,
     lecture_id: Optional[str] = Form(None),
@@ -28,16 +26,34 @@ async def upload_contents(
     if not (files or raw_texts or links):
         raise HTTPException(400, detail="Nenhum conteúdo enviado")
 
-    await asyncio.to_thread(
-        process_and_index,
+    # a vetorização roda no pool de ingestão; acompanhe por GET /contents/jobs/{id}
+    job_id = await submit_job(
+        course_id,
         lecture_id,
         files,
         raw_texts or [],
         links or [],
     )
+    return {"detail": "Vectorização enfileirada", "job_id": job_id}
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Job not found")
+    return job
+
 
-    # 3) resposta só vem depois que tudo foi vetorizado
-    return {"detail": "Vectorização concluída com sucesso"}
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_ingest_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Job not found")
+    # jobs 'expired' já tiveram os arquivos apagados: é preciso reenviar o conteúdo
+    if not retry_job(job_id):
+        raise HTTPException(409, detail=f"Job com status {job['status']} não pode ser reprocessado")
+    return {"detail": "Job reenfileirado", "job_id": job_id}
 
 @router.get("/media/{file_path:path}")
 async def serve_media(
@@ -19,10 +19,9 @@ from typing import List, Dict, Any, Optional
 
 from services.course_manager import create_course, create_lesson, get_course, get_lesson, list_lessons_by_course, save_file_db
 from services.file_manager import store_upload
-from services.schemas import CourseCreate, CourseOut, LessonIn, LessonOut
+from services.schemas import CourseCreate, CourseOut, LessonIn, LessonOut, LessonProcessingOut
 
-from app.shorts_agent.services import process_local_video
-from app.threads_agent.agent import generate_thread_from_transcript
+from services.lesson_pipeline import FAILED, PENDING, enqueue_lesson, processing_summary
 
 async def get_db() -> AsyncSession:  # pragma: no cover
     async with SessionLocal() as session:
@@ -81,33 +80,18 @@ async def create_lesson_with_upload(
     )
 
     stored_video = await store_upload(db, video, course_id, lesson.id)
-    
-    results, transcript_segments, path_names = process_local_video(stored_video.path, course_id=course_id, lesson_id=lesson.id)
-    
-    transcript_text = "\n".join([seg.text for seg in transcript_segments]) 
-    
-    threads = generate_thread_from_transcript(transcript_text)
-    
-    lesson.video_transcript = transcript_text
+
+    # o processamento pesado (Whisper, Gemini, ffmpeg) roda no pipeline em
+    # background; acompanhe por GET .../lessons/{lesson_id}/processing
     lesson.video = stored_video.path
-    lesson.thread = {"messages": threads}
+    lesson.processing_status = PENDING
+    lesson.processing = {}
     await db.commit()
     
-    
     for file_up in safe_attachments:
         await store_upload(db, file_up, course_id, lesson.id)
-        
-    for path in path_names:
-        await save_file_db(
-            db,
-            name=os.path.basename(path),
-            path=path,
-            mime="video/mp4",
-            course_id=course_id,
-            lesson_id=lesson.id,
-            category="shorts"
-        )
 
+    enqueue_lesson(lesson.id)
     return lesson
 
 
@@ -221,4 +205,39 @@ async def get_lesson_endpoint(
     lesson = await get_lesson(db, lesson_id, with_files=with_files)
     if lesson is None or lesson.course_id != course_id:
         raise HTTPException(404, detail="Lesson not found in this course")
-    return lesson
\ No newline at end of file
+    return lesson
+
+
+@router.get("/{course_id}/lessons/{lesson_id}/processing", response_model=LessonProcessingOut)
+async def get_lesson_processing_endpoint(
+    course_id: int,
+    lesson_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    lesson = await get_lesson(db, lesson_id)
+    if lesson is None or lesson.course_id != course_id:
+        raise HTTPException(404, detail="Lesson not found in this course")
+    return processing_summary(lesson)
+
+
+@router.post(
+    "/{course_id}/lessons/{lesson_id}/processing/retry",
+    response_model=LessonProcessingOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def retry_lesson_processing_endpoint(
+    course_id: int,
+    lesson_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    lesson = await get_lesson(db, lesson_id)
+    if lesson is None or lesson.course_id != course_id:
+        raise HTTPException(404, detail="Lesson not found in this course")
+    if lesson.processing_status != FAILED:
+        raise HTTPException(409, detail="Lesson processing has not failed")
+    # continua do primeiro estágio sem resultado
+    lesson.processing_status = PENDING
+    lesson.processing_error = None
+    await db.commit()
+    enqueue_lesson(lesson.id)
+    return processing_summary(lesson)
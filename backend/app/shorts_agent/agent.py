@@ -1,10 +1,35 @@
-import json
-from typing import List, Tuple
-from google import generativeai as genai
-from app.config import GOOGLE_API_KEY
-
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-pro")
+import math
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Iterator, List, Optional, Tuple
+from tenacity import Retrying, stop_after_attempt, wait_random_exponential
+from services.json_stream import JsonArrayStream
+from services.llm_gateway import GATEWAY
+
+GEMINI_MODEL = "models/gemini-2.5-pro"
+# Incrementar ao mudar os prompts abaixo: invalida o cache de segmentação.
+PROMPT_VERSION = "2"
+
+# Transcrições mais longas que uma janela são segmentadas em janelas sobrepostas,
+# em paralelo; a sobreposição deve cobrir o maior short (120 s).
+SEGMENT_WINDOW_SECONDS = float(os.getenv("SEGMENT_WINDOW_SECONDS", "900"))
+SEGMENT_WINDOW_OVERLAP = float(os.getenv("SEGMENT_WINDOW_OVERLAP", "120"))
+SEGMENT_CONCURRENCY = int(os.getenv("SEGMENT_CONCURRENCY", "4"))
+CLASSIFY_SAMPLE_CHARS = 8000
+
+
+def _classification_sample(transcript: str, limit: int = CLASSIFY_SAMPLE_CHARS) -> str:
+    """Começo, meio e fim da transcrição, para aulas longas não serem julgadas só pela abertura."""
+    if len(transcript) <= limit:
+        return transcript
+    part = limit // 3
+    middle = (len(transcript) - part) // 2
+    return "\n...\n".join(
+        (transcript[:part], transcript[middle:middle + part], transcript[-part:])
+    )
 
 
 def classify_video_type(transcript: str) -> str:
@@ -20,11 +45,10 @@ You are a video classifier. Given a transcript, return one of:
 Respond only with the word. No explanation.
 
 Transcript:
-{transcript[:8000]}
+{_classification_sample(transcript)}
 """
     try:
-        res = model.generate_content(prompt)
-        return res.text.strip().lower()
+        return GATEWAY.generate(prompt, model=GEMINI_MODEL).strip().lower()
     except Exception as e:
         print("Classification error:", e)
         return "other"
@@ -120,38 +144,194 @@ Transcript:
 """
 
 
-def chunk_transcript_with_gemini(transcript_segments: List) -> List[Tuple[float, float, str]]:
-    raw_text = "".join(
+def transcript_to_text(transcript_segments: List) -> str:
+    return "".join(
         f"[{s.start:.2f}-{s.end:.2f}] {s.text.strip()}\n" for s in transcript_segments
     )
 
-    video_type = classify_video_type(raw_text)
-    print(f"📺 Video type detected: {video_type}")
 
+def split_windows(transcript_segments: List) -> List[Tuple[float, float, List]]:
+    """
+    Divide a transcrição em janelas (início, fim, segmentos) de
+    SEGMENT_WINDOW_SECONDS que se sobrepõem em SEGMENT_WINDOW_OVERLAP.
+    """
+    if not transcript_segments:
+        return []
+    total = transcript_segments[-1].end
+    if total <= SEGMENT_WINDOW_SECONDS:
+        return [(0.0, math.inf, list(transcript_segments))]
+
+    step = SEGMENT_WINDOW_SECONDS - SEGMENT_WINDOW_OVERLAP
+    windows, start = [], 0.0
+    while True:
+        end = start + SEGMENT_WINDOW_SECONDS
+        items = [s for s in transcript_segments if s.end > start and s.start < end]
+        windows.append((start, end, items))
+        if end >= total:
+            return windows
+        start += step
+
+
+class _WindowMerger:
+    """
+    Junta os shorts das janelas de forma determinística e incremental: cada
+    janela é dona do trecho entre os pontos médios das sobreposições vizinhas e
+    só o short cujo centro cai ali é mantido. Sobras de sobreposição com o
+    short anterior são aparadas (ou descartadas, se for o mesmo trecho).
+    """
+
+    def __init__(self, windows: List[Tuple[float, float, List]]):
+        half = SEGMENT_WINDOW_OVERLAP / 2
+        last = len(windows) - 1
+        self._owned = [
+            (-math.inf if i == 0 else start + half, math.inf if i == last else end - half)
+            for i, (start, end, _) in enumerate(windows)
+        ]
+        self._last_end = -math.inf
+
+    def push(self, window: int, chunk: Tuple[float, float, str]) -> Optional[Tuple[float, float, str]]:
+        start, end, text = chunk
+        lo, hi = self._owned[window]
+        if not lo <= (start + end) / 2 < hi:
+            return None
+        if start < self._last_end:
+            # mais da metade repetida: é o mesmo trecho visto de novo
+            if self._last_end - start > (end - start) / 2:
+                return None
+            start = self._last_end
+        self._last_end = end
+        return (start, end, text)
+
+
+class SegmentationIncomplete(RuntimeError):
+    """
+    Alguma janela não devolveu shorts mesmo após os retries. Levantada depois
+    que as demais janelas terminam (os shorts delas já foram entregues);
+    `missing` traz os intervalos (início, fim) em segundos que ficaram sem corte.
+    """
+
+    def __init__(self, missing: List[Tuple[float, float]]):
+        self.missing = missing
+        ranges = ", ".join(f"{start:.0f}-{end:.0f}s" for start, end in missing)
+        super().__init__(f"Segmentação incompleta: sem resultado em {ranges}")
+
+    def __reduce__(self):
+        # atravessa o ProcessPoolExecutor do pipeline de aulas
+        return type(self), (self.missing,)
+
+
+_RETRY = dict(
+    wait=wait_random_exponential(multiplier=2, max=30),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+
+
+def _stream_window(video_type: str, raw_text: str) -> Iterator[Tuple[float, float, str]]:
+    """
+    Gera os shorts de uma janela à medida que o Gemini fecha cada objeto do
+    array. Um stream que termina antes do `]` levanta erro depois de entregar
+    os completos, para a janela ser refeita e não passar por segmentação inteira.
+    """
     prompt = build_prompt(video_type, raw_text)
-
+    chunks = GATEWAY.stream(prompt, model=GEMINI_MODEL, response_mime_type="application/json")
+
+    parser = JsonArrayStream()
+    count = 0
+    for text in chunks:
+        for c in parser.feed(text):
+            count += 1
+            yield (c["start"], c["end"], c["text"])
+        if parser.finished:
+            break
+    if not count:
+        raise ValueError("Gemini returned no valid JSON content.")
+    if not parser.finished:
+        raise ValueError("Gemini stream ended before the closing ']' of the JSON array.")
+
+
+def iter_transcript_chunks(
+    transcript_segments: List, video_type: Optional[str] = None
+) -> Iterator[Tuple[float, float, str]]:
+    """
+    Segmenta a transcrição em janelas concorrentes e entrega os shorts em ordem
+    assim que ficam prontos: os da janela corrente saem direto do stream, os das
+    seguintes esperam num buffer até a anterior terminar. Uma tentativa que cai
+    no meio é refeita e só o que passa do fim do último short já entregue pela
+    janela segue adiante. Se o consumidor para antes do fim, os streams das
+    janelas são encerrados. Se uma janela falha de vez, levanta
+    `SegmentationIncomplete` ao final, depois de entregar o resto.
+    """
+    if video_type is None:
+        video_type = classify_video_type(transcript_to_text(transcript_segments))
+        print(f"📺 Video type detected: {video_type}")
+
+    windows = split_windows(transcript_segments)
+    if not windows:
+        return
+
+    events: "queue.Queue[tuple[int, Optional[tuple]]]" = queue.Queue()
+    failed = []
+    stop = threading.Event()
+
+    def _run(idx: int, window):
+        start, end, items = window
+        if not items:  # janela só de silêncio: não há o que segmentar
+            events.put((idx, None))
+            return
+        raw_text = transcript_to_text(items)
+        emitted = -math.inf  # fim do último short que esta janela já entregou
+        try:
+            for attempt in Retrying(**_RETRY):
+                with attempt, closing(_stream_window(video_type, raw_text)) as chunks:
+                    for c_start, c_end, text in chunks:
+                        if stop.is_set():
+                            return
+                        # retry: o começo repete o que a tentativa anterior já mandou
+                        if c_end <= emitted:
+                            continue
+                        c_start, emitted = max(c_start, emitted), c_end
+                        events.put((idx, (c_start, c_end, text)))
+        except Exception as e:
+            failed.append(idx)
+            print(f"Gemini chunking error (janela {start:.0f}-{end:.0f}s):", e)
+        finally:
+            events.put((idx, None))
+
+    merger = _WindowMerger(windows)
+    pending: dict[int, list] = {i: [] for i in range(len(windows))}
+    done: set[int] = set()
+    current = 0
+
+    pool = ThreadPoolExecutor(max_workers=min(SEGMENT_CONCURRENCY, len(windows)))
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "response_mime_type": "application/json"
-            }
-        )
-
-        raw_json = (
-            response.text.strip()
-            if hasattr(response, "text") and response.text
-            else (response.parts[0].text.strip() if hasattr(response, "parts") and response.parts else "")
+        for idx, window in enumerate(windows):
+            pool.submit(_run, idx, window)
+
+        while current < len(windows):
+            idx, chunk = events.get()
+            if chunk is None:
+                done.add(idx)
+            elif idx != current:
+                pending[idx].append(chunk)
+                continue
+            elif (out := merger.push(idx, chunk)) is not None:
+                yield out
+
+            while current in done:
+                current += 1
+                for chunk in pending.pop(current, ()):
+                    if (out := merger.push(current, chunk)) is not None:
+                        yield out
+    finally:
+        # consumidor parou (ou acabou): janelas em andamento fecham seus streams
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if len(windows) > 1:
+        print(f"🧩 Segmentação em {len(windows)} janelas ({len(failed)} sem resultado)")
+    if failed:
+        raise SegmentationIncomplete(
+            [(windows[i][0], min(windows[i][1], windows[i][2][-1].end)) for i in sorted(failed)]
         )
 
-        if not raw_json or not raw_json.startswith("["):
-            raise ValueError("Gemini returned no valid JSON content.")
-
-        print("🔍 Gemini raw output:\n", raw_json)
-
-        chunks = json.loads(raw_json)
-        return [(c["start"], c["end"], c["text"]) for c in chunks]
-
-    except Exception as e:
-        print("Gemini chunking error:", e)
-        return []
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+ARTIFACT_CACHE_PATH = Path(os.getenv("ARTIFACT_CACHE_PATH", "data/video_artifacts.sqlite3"))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+
+class ArtifactCache:
+    """
+    Cache de artefatos de vídeo (transcrição, tipo, segmentos) endereçado pelo
+    hash do arquivo mais as versões de modelo/prompt que o produziram.
+
+    Fica em SQLite para ser compartilhado pelos processos do pipeline; quando o
+    total passa de `max_bytes`, os artefatos usados há mais tempo saem primeiro.
+    """
+
+    def __init__(self, path: Path = ARTIFACT_CACHE_PATH, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    key       TEXT PRIMARY KEY,
+                    payload   TEXT NOT NULL,
+                    size      INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_artifacts_lru ON artifacts (last_used);
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path   TEXT PRIMARY KEY,
+                    size   INTEGER NOT NULL,
+                    mtime  REAL NOT NULL,
+                    digest TEXT NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def key(kind: str, video_hash: str, *versions: Any) -> str:
+        return ":".join([kind, video_hash, *map(str, versions)])
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE artifacts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM artifacts ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM artifacts WHERE key = ?", doomed)
+
+    def video_hash(self, video_path: str) -> str:
+        """sha256 do arquivo, memorizado por (caminho, tamanho, mtime)."""
+        st = os.stat(video_path)
+        path = str(Path(video_path).resolve())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM file_hashes WHERE path = ? AND size = ? AND mtime = ?",
+                (path, st.st_size, st.st_mtime),
+            ).fetchone()
+        if row:
+            return row[0]
+        with open(video_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime, digest) VALUES (?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime, digest),
+            )
+            self._conn.commit()
+        return digest
+
+
+ARTIFACTS = ArtifactCache()
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from .whisper_manager import WHISPER, WHISPER_COMPUTE_TYPE, WHISPER_DEVICE, WHISPER_MODEL_SIZE, WHISPER_THREADS
+
+SAMPLE_RATE = 16000
+# Áudios a partir deste tamanho vão para o modo longo (0 desliga).
+LONG_AUDIO_SECONDS = float(os.getenv("LONG_AUDIO_SECONDS", "1200"))
+# Tamanho-alvo de cada pedaço; o corte real cai no silêncio seguinte.
+LONG_CHUNK_SECONDS = float(os.getenv("LONG_CHUNK_SECONDS", "300"))
+TRANSCRIBE_WORKERS = int(
+    os.getenv("TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2))))
+)
+
+
+@dataclass
+class TranscriptWord:
+    start: float
+    end: float
+    word: str
+    probability: float
+
+
+@dataclass
+class TranscriptSegment:
+    """Mesma interface (`start`, `end`, `text`, `words`) dos segmentos do faster-whisper."""
+
+    start: float
+    end: float
+    text: str
+    words: List[TranscriptWord] = field(default_factory=list)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_worker_model = None  # um modelo por processo do pool
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=TRANSCRIBE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _shutdown_pool() -> bool:
+    """Encerra o pool (e os modelos dos workers); chamado pelo WHISPER quando ocioso."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return False
+    pool.shutdown(wait=True)
+    return True
+
+
+WHISPER.add_idle_hook(_shutdown_pool)
+
+
+def _transcribe_chunk(audio: np.ndarray, offset: float, cpu_threads: int) -> List[TranscriptSegment]:
+    global _worker_model
+    if _worker_model is None:
+        from faster_whisper import WhisperModel
+
+        _worker_model = WhisperModel(
+            WHISPER_MODEL_SIZE,
+            device=WHISPER_DEVICE,
+            compute_type=WHISPER_COMPUTE_TYPE,
+            cpu_threads=cpu_threads,
+        )
+    segments, _ = _worker_model.transcribe(audio, word_timestamps=True)
+    return [
+        TranscriptSegment(
+            start=s.start + offset,
+            end=s.end + offset,
+            text=s.text,
+            words=[
+                TranscriptWord(w.start + offset, w.end + offset, w.word, w.probability)
+                for w in (s.words or [])
+            ],
+        )
+        for s in segments
+    ]
+
+
+def split_on_silence(audio: np.ndarray, target_seconds: float = LONG_CHUNK_SECONDS) -> List[tuple[int, int]]:
+    """
+    Divide o áudio em faixas (início, fim) em amostras de ~`target_seconds`,
+    cortando sempre no meio de um silêncio detectado pelo VAD (Silero).
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+    if not speech:
+        return [(0, len(audio))]
+
+    target = int(target_seconds * SAMPLE_RATE)
+    bounds, chunk_start = [], 0
+    for current, nxt in zip(speech, speech[1:]):
+        if current["end"] - chunk_start >= target:
+            cut = (current["end"] + nxt["start"]) // 2
+            bounds.append((chunk_start, cut))
+            chunk_start = cut
+    bounds.append((chunk_start, len(audio)))
+    return bounds
+
+
+def transcribe_long(audio: np.ndarray) -> List[TranscriptSegment]:
+    """
+    Transcreve áudio longo em pedaços cortados no silêncio, em paralelo no pool de
+    processos, e costura os segmentos com os offsets (inclusive das palavras).
+
+    Ocupa uma vaga do WHISPER como qualquer transcrição, e os workers dividem
+    entre si as WHISPER_THREADS dessa vaga; o pool é encerrado junto com o
+    modelo compartilhado quando o whisper fica ocioso.
+    """
+    started = time.perf_counter()
+    bounds = split_on_silence(audio)
+    cpu_threads = max(1, WHISPER_THREADS // TRANSCRIBE_WORKERS)
+    with WHISPER.slot():
+        pool = _get_pool()
+        futures = [
+            pool.submit(_transcribe_chunk, audio[s:e], s / SAMPLE_RATE, cpu_threads)
+            for s, e in bounds
+        ]
+        try:
+            segments = [seg for fut in futures for seg in fut.result()]
+        finally:
+            for fut in futures:
+                fut.cancel()
+    segments.sort(key=lambda seg: seg.start)
+    print(
+        f"🎙️ {len(audio) / SAMPLE_RATE / 60:.1f} min transcritos em {len(bounds)} pedaços "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+    return segments
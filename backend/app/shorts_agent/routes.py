@@ -1,5 +1,8 @@
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from .agent import SegmentationIncomplete
 from .services import process_local_video
 
 router = APIRouter(tags=["Shorts"])
@@ -9,5 +12,10 @@ class VideoPathRequest(BaseModel):
 
 @router.post("/generate")
 async def generate_shorts(req: VideoPathRequest):
-    result = process_local_video(req.video_path)
+    # whisper/ffmpeg/LLM são bloqueantes: fora do event loop
+    try:
+        result = await asyncio.to_thread(process_local_video, req.video_path)
+    except SegmentationIncomplete as e:
+        # os shorts das outras janelas foram gerados, mas o vídeo ficou com buracos
+        raise HTTPException(502, detail=str(e))
     return {"message": "Shorts generated", "results": result}
@@ -1,47 +1,160 @@
-from .utils import extract_audio, transcribe_audio, clip_video
-from .agent import chunk_transcript_with_gemini
+from .utils import CLIP_MODE, load_audio, transcribe_audio, render_clips, render_clips_batched
+from .agent import GEMINI_MODEL, PROMPT_VERSION, classify_video_type, iter_transcript_chunks, transcript_to_text
+from .artifact_cache import ARTIFACTS
+from .long_transcribe import TranscriptSegment, TranscriptWord
+from .whisper_manager import WHISPER_COMPUTE_TYPE, WHISPER_MODEL_SIZE
 from pathlib import Path
+from typing import Iterable, Iterator, List
 import os
 
 UPLOADS_ROOT = Path("/app/uploads").resolve()
 
-def process_local_video(video_path: str, course_id: int = None, lesson_id: int = None):
-    src = Path(video_path).resolve()
-    if not src.exists():
-        raise FileNotFoundError(f"Video file not found: {src}")
 
+def shorts_dir(course_id: int = None, lesson_id: int = None) -> Path:
     # 2 ▸ define pasta de destino
     if course_id is not None and lesson_id is not None:
         dest_dir = UPLOADS_ROOT / f"course_{course_id}/lesson_{lesson_id}/shorts"
     else:
         dest_dir = UPLOADS_ROOT / "default/shorts"
-        
     dest_dir.mkdir(parents=True, exist_ok=True)
+    return dest_dir
+
+
+def transcript_key(video_path: str) -> str:
+    video_hash = ARTIFACTS.video_hash(video_path)
+    return ARTIFACTS.key("transcript", video_hash, WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE)
+
+
+def transcribe_video(video_path: str):
+    key = transcript_key(video_path)
+    cached = ARTIFACTS.get(key)
+    if cached is not None:
+        print(f"♻️ Transcrição reaproveitada do cache: {video_path}")
+        return segments_from_dicts(cached)
 
-    
     print(f"Processing video: {video_path}")
-    audio_path = extract_audio(video_path)
-    transcript_segments = transcribe_audio(audio_path)
-    segments = chunk_transcript_with_gemini(transcript_segments)
+    audio = load_audio(video_path)
+    transcript_segments = transcribe_audio(audio)
+    del audio
+    ARTIFACTS.put(key, segments_to_dicts(transcript_segments))
+    return transcript_segments
+
+
+def iter_segment_transcript(transcript_segments, video_path: str = None) -> Iterator[tuple]:
+    """
+    Classifica e segmenta a transcrição, entregando cada short assim que o
+    Gemini o fecha. Com `video_path`, o resultado fica no cache pelo hash do
+    vídeo + versões do whisper e do prompt, mas só se a segmentação saiu
+    completa: uma parcial levanta `SegmentationIncomplete` e não é guardada.
+    """
+    if video_path is None:
+        yield from iter_transcript_chunks(transcript_segments)
+        return
+
+    key = ARTIFACTS.key("segments", transcript_key(video_path), GEMINI_MODEL, PROMPT_VERSION)
+    cached = ARTIFACTS.get(key)
+    if cached is not None:
+        print(f"♻️ Segmentação reaproveitada do cache ({cached['video_type']}): {video_path}")
+        yield from (tuple(s) for s in cached["segments"])
+        return
+
+    video_type = classify_video_type(transcript_to_text(transcript_segments))
+    print(f"📺 Video type detected: {video_type}")
+    segments = []
+    for segment in iter_transcript_chunks(transcript_segments, video_type=video_type):
+        segments.append(segment)
+        yield segment
+    # só chega aqui se todas as janelas terminaram com o array fechado
+    # (senão iter_transcript_chunks levanta); lista vazia também não vale guardar
+    if segments:
+        ARTIFACTS.put(key, {"video_type": video_type, "segments": [list(s) for s in segments]})
+
+
+def segment_transcript(transcript_segments, video_path: str = None) -> List[tuple]:
+    return list(iter_segment_transcript(transcript_segments, video_path))
+
+
+def render_segments(video_path: str, segments: Iterable, course_id: int = None, lesson_id: int = None) -> List[dict]:
+    """
+    Renderiza os shorts de `segments`. No modo paralelo aceita um iterador:
+    cada corte entra na fila do ffmpeg assim que o segmento chega. Cortes em
+    que o ffmpeg falhou ficam de fora do resultado (e são logados).
+    """
+    src = Path(video_path).resolve()
+    dest_dir = shorts_dir(course_id, lesson_id)
 
     results: List[dict] = []
-    path_names: List[str] = []
+    received: List[tuple] = []
+    clips: List[tuple] = []
 
     base = src.stem
-    for i, (start, end, text) in enumerate(segments):
-        short_name = f"{base}_part{i}.mp4"
-        out_path = dest_dir / short_name
-        clip_video(src, start, end, out_path)
 
-        path_names.append(str(out_path))
+    def _clips():
+        for i, segment in enumerate(segments):
+            received.append(segment)
+            clips.append((segment[0], segment[1], str(dest_dir / f"{base}_part{i}.mp4")))
+            yield clips[-1]
+
+    if CLIP_MODE == "batch":
+        renders = render_clips_batched(str(src), list(_clips()))
+    else:
+        renders = render_clips(str(src), _clips())
 
+    for (start, end, text), (_, _, out_path), timing in zip(received, clips, renders):
+        if not timing["ok"]:
+            print(f"⚠️ Falha ao renderizar o short {out_path} ({start:.1f}s–{end:.1f}s); ignorado")
+            Path(out_path).unlink(missing_ok=True)  # saída parcial do ffmpeg
+            continue
         results.append(
             {
                 "start": start,
                 "end": end,
                 "text": text,
-                "short_path": str(out_path),
+                "short_path": out_path,
+                "render_mode": timing["mode"],
+                "render_seconds": timing["seconds"],
             }
         )
+    return results
+
+
+def segments_to_dicts(transcript_segments) -> List[dict]:
+    """Serializa segmentos (faster-whisper ou TranscriptSegment) para JSON."""
+    return [
+        {
+            "start": s.start,
+            "end": s.end,
+            "text": s.text,
+            "words": [
+                {"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                for w in (s.words or [])
+            ],
+        }
+        for s in transcript_segments
+    ]
+
+
+def segments_from_dicts(items: List[dict]) -> List[TranscriptSegment]:
+    return [
+        TranscriptSegment(
+            start=d["start"],
+            end=d["end"],
+            text=d["text"],
+            words=[TranscriptWord(**w) for w in d.get("words", [])],
+        )
+        for d in items
+    ]
+
+
+def process_local_video(video_path: str, course_id: int = None, lesson_id: int = None):
+    src = Path(video_path).resolve()
+    if not src.exists():
+        raise FileNotFoundError(f"Video file not found: {src}")
+
+    transcript_segments = transcribe_video(video_path)
+    # o ffmpeg começa nos primeiros shorts enquanto o Gemini ainda gera os demais
+    segments = iter_segment_transcript(transcript_segments, str(src))
+    results = render_segments(str(src), segments, course_id, lesson_id)
+    path_names = [r["short_path"] for r in results]
 
-    return results, transcript_segments, path_names
\ No newline at end of file
+    return results, transcript_segments, path_names
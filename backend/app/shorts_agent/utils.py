@@ -1,7 +1,32 @@
+import bisect
+import os
 import subprocess
-from faster_whisper import WhisperModel
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Union
 
-FFMPEG_PATH = "/usr/bin/ffmpeg"  # Use the full path from `which ffmpeg`
+import numpy as np
+
+from faster_whisper import decode_audio as fw_decode_audio
+
+from .long_transcribe import LONG_AUDIO_SECONDS, transcribe_long
+from .whisper_manager import WHISPER
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "/usr/bin/ffmpeg")  # Use the full path from `which ffmpeg`
+FFPROBE_PATH = os.getenv("FFPROBE_PATH", "/usr/bin/ffprobe")
+SAMPLE_RATE = 16000  # o que o Whisper espera
+# "stream" decodifica direto para memória; "wav" mantém o arquivo intermediário
+AUDIO_MODE = os.getenv("AUDIO_MODE", "stream")
+DECODE_BLOCK_BYTES = 1 << 20  # blocos de PCM lidos do pipe do ffmpeg (~33 s de áudio)
+# ffmpegs de corte em paralelo; cada libx264 recebe cpu_count / CLIP_WORKERS threads
+CLIP_WORKERS = int(os.getenv("CLIP_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+CLIP_FAST_PATH = os.getenv("CLIP_FAST_PATH", "1") == "1"
+# "parallel" = um ffmpeg por corte; "batch" = um ffmpeg decodifica e gera vários cortes
+CLIP_MODE = os.getenv("CLIP_MODE", "parallel")
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", "8"))
+KEYFRAME_TOLERANCE = 0.05  # segundos
 
 def extract_audio(video_path: str) -> str:
     audio_path = video_path.replace(".mp4", ".wav")
@@ -11,20 +36,257 @@ def extract_audio(video_path: str) -> str:
     ])
     return audio_path
 
-def transcribe_audio(audio_path: str):
-    model = WhisperModel("base")
-    segments, _ = model.transcribe(audio_path, word_timestamps=True)
-    return list(segments)
+def probe_duration(video_path: str) -> Optional[float]:
+    """Duração do arquivo em segundos segundo o ffprobe (None se não der para ler)."""
+    try:
+        proc = subprocess.run(
+            [
+                FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration",
+                "-of", "csv=p=0", str(video_path),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        return float(proc.stdout.strip())
+    except (OSError, ValueError):
+        return None
 
-def clip_video(video_path: str, start: float, end: float, output_path: str):
-    subprocess.run([
-        FFMPEG_PATH, "-y",
+
+def decode_audio(video_path: str) -> np.ndarray:
+    """
+    Decodifica o áudio do vídeo via pipe do ffmpeg já em 16 kHz mono, sem arquivo
+    temporário, e devolve o buffer float32 em [-1, 1] que o faster-whisper aceita.
+    O PCM é lido em blocos e convertido direto num float32 pré-alocado pela
+    duração do vídeo, então o pico de memória é o próprio float32 (~230 MB/hora).
+    """
+    duration = probe_duration(video_path)
+    # 1 s de folga: a duração do contêiner nem sempre bate com a do áudio
+    audio = np.empty(int(((duration or 0) + 1) * SAMPLE_RATE), dtype=np.float32)
+    filled = 0
+
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(
+            [
+                FFMPEG_PATH, "-nostdin", "-loglevel", "error",
+                "-i", video_path,
+                "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+                "-f", "s16le", "-acodec", "pcm_s16le", "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        with proc.stdout:
+            while block := proc.stdout.read(DECODE_BLOCK_BYTES):
+                samples = np.frombuffer(block, dtype=np.int16, count=len(block) // 2)
+                end = filled + len(samples)
+                if end > len(audio):
+                    # duração desconhecida ou subestimada: cresce em 25%
+                    grown = np.empty(max(end, len(audio) + len(audio) // 4), dtype=np.float32)
+                    grown[:filled] = audio[:filled]
+                    audio = grown
+                np.multiply(samples, 1 / 32768.0, out=audio[filled:end], casting="unsafe")
+                filled = end
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"ffmpeg falhou ao decodificar {video_path}: {stderr.read().decode(errors='replace')}"
+            )
+    return audio[:filled]
+
+
+def load_audio(video_path: str) -> Union[str, np.ndarray]:
+    """Entrada para `transcribe_audio` conforme AUDIO_MODE."""
+    if AUDIO_MODE == "wav":
+        return extract_audio(video_path)
+    return decode_audio(video_path)
+
+
+def _audio_seconds(audio_path: Union[str, np.ndarray]) -> float:
+    if isinstance(audio_path, np.ndarray):
+        return len(audio_path) / SAMPLE_RATE
+    # WAV do extract_audio: a duração sai do cabeçalho, sem decodificar
+    with wave.open(audio_path, "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def transcribe_audio(audio_path: Union[str, np.ndarray]):
+    if LONG_AUDIO_SECONDS and _audio_seconds(audio_path) >= LONG_AUDIO_SECONDS:
+        audio = audio_path if isinstance(audio_path, np.ndarray) else fw_decode_audio(audio_path)
+        return transcribe_long(audio)
+
+    with WHISPER.acquire() as model:
+        segments, _ = model.transcribe(audio_path, word_timestamps=True)
+        # o gerador é preguiçoso: a transcrição de fato acontece aqui dentro
+        return list(segments)
+
+def clip_video(video_path: str, start: float, end: float, output_path: str, copy: bool = False, threads: int = 0):
+    """
+    Corta [start, end] do vídeo. Com `copy=True` faz stream copy (sem reencode);
+    só é seguro quando `start` cai num keyframe. Devolve o código de saída do ffmpeg.
+    """
+    if copy:
+        codec_args = ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    else:
+        codec_args = [
+            "-c:v", "libx264",      # re-encode video
+            "-c:a", "aac",          # re-encode audio
+            "-preset", "fast",      # faster encoding
+            "-crf", "23",           # constant rate factor (lower = better quality)
+        ]
+        if threads:
+            codec_args += ["-threads", str(threads)]
+    proc = subprocess.run([
+        FFMPEG_PATH, "-y", "-nostdin", "-loglevel", "error",
         "-ss", str(start),
         "-to", str(end),
-        "-i", video_path,
-        "-c:v", "libx264",      # re-encode video
-        "-c:a", "aac",          # re-encode audio
-        "-preset", "fast",      # faster encoding
-        "-crf", "23",           # constant rate factor (lower = better quality)
-        output_path
+        "-i", str(video_path),
+        *codec_args,
+        str(output_path)
     ])
+    return proc.returncode
+
+
+def probe_keyframes(video_path: str) -> list[float]:
+    """Timestamps dos keyframes do primeiro stream de vídeo (lidos dos pacotes, sem decodificar)."""
+    proc = subprocess.run(
+        [
+            FFPROBE_PATH, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0",
+            str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return []
+    keyframes = []
+    for line in proc.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(float(pts))
+    keyframes.sort()
+    return keyframes
+
+
+def _on_keyframe(t: float, keyframes: list[float]) -> bool:
+    i = bisect.bisect_left(keyframes, t - KEYFRAME_TOLERANCE)
+    return i < len(keyframes) and abs(keyframes[i] - t) <= KEYFRAME_TOLERANCE
+
+
+def render_clips(
+    video_path: str,
+    clips: Iterable[tuple[float, float, str]],
+    workers: int = CLIP_WORKERS,
+    fast_path: bool = CLIP_FAST_PATH,
+) -> list[dict]:
+    """
+    Renderiza vários cortes em paralelo, com `workers` processos ffmpeg e os
+    núcleos divididos entre eles. Cortes que começam num keyframe vão por stream
+    copy (se `fast_path`); os demais, ou um copy que falhe, são reencodados.
+    `clips` pode ser um gerador: cada corte é submetido assim que chega.
+    Devolve, na ordem de `clips`, o modo usado, o tempo gasto e se deu certo.
+    """
+    keyframes = probe_keyframes(video_path) if fast_path else []
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+
+    def _render(clip):
+        start, end, out = clip
+        started = time.perf_counter()
+        mode = "copy" if keyframes and _on_keyframe(start, keyframes) else "encode"
+        rc = clip_video(video_path, start, end, out, copy=mode == "copy", threads=threads)
+        if rc != 0 and mode == "copy":
+            mode = "encode"
+            rc = clip_video(video_path, start, end, out, threads=threads)
+        return {"mode": mode, "seconds": round(time.perf_counter() - started, 3), "ok": rc == 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(_render, clips))
+
+
+def has_audio(video_path: str) -> bool:
+    proc = subprocess.run(
+        [
+            FFPROBE_PATH, "-v", "error", "-select_streams", "a",
+            "-show_entries", "stream=index", "-of", "csv=p=0", str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    return bool(proc.stdout.strip())
+
+
+def _batch_command(video_path: str, group: list[tuple[float, float, str]], audio: bool, threads: int) -> list[str]:
+    """
+    Um único ffmpeg para o grupo: busca até o início do primeiro corte, decodifica
+    até o fim do último e distribui os frames com split/trim para cada saída.
+    """
+    g_start = min(start for start, _, _ in group)
+    g_end = max(end for _, end, _ in group)
+    n = len(group)
+
+    graph = [f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n))]
+    if audio:
+        graph.append(f"[0:a]asplit={n}" + "".join(f"[a{i}]" for i in range(n)))
+    for i, (start, end, _) in enumerate(group):
+        rs, re_ = start - g_start, end - g_start
+        graph.append(f"[v{i}]trim=start={rs:.3f}:end={re_:.3f},setpts=PTS-STARTPTS[vo{i}]")
+        if audio:
+            graph.append(f"[a{i}]atrim=start={rs:.3f}:end={re_:.3f},asetpts=PTS-STARTPTS[ao{i}]")
+
+    cmd = [
+        FFMPEG_PATH, "-y", "-nostdin", "-loglevel", "error",
+        "-ss", f"{g_start:.3f}",
+        "-t", f"{g_end - g_start:.3f}",
+        "-i", str(video_path),
+        "-filter_complex", ";".join(graph),
+    ]
+    for i, (_, _, out) in enumerate(group):
+        cmd += ["-map", f"[vo{i}]"]
+        if audio:
+            cmd += ["-map", f"[ao{i}]", "-c:a", "aac"]
+        cmd += ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-threads", str(threads), str(out)]
+    return cmd
+
+
+def render_clips_batched(
+    video_path: str,
+    clips: list[tuple[float, float, str]],
+    batch_size: int = CLIP_BATCH_SIZE,
+    workers: int = CLIP_WORKERS,
+) -> list[dict]:
+    """
+    Como `render_clips`, mas abrindo e decodificando o vídeo uma vez por grupo
+    de até `batch_size` cortes consecutivos (ordenados pelo início), em vez de uma
+    vez por corte. Os grupos rodam em paralelo; o tempo de cada corte é o do seu
+    grupo dividido pelo tamanho dele (`batch_seconds` traz o total do grupo).
+    Se o ffmpeg de um grupo falhar, os cortes dele são refeitos um a um por
+    `render_clips` (marcados com `batch_failed`).
+    """
+    audio = has_audio(video_path)
+    order = sorted(range(len(clips)), key=lambda i: clips[i][0])
+    groups = [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+    threads = max(1, (os.cpu_count() or 1) // max(1, min(workers, len(groups) or 1)))
+    results: list[dict] = [{} for _ in clips]
+
+    def _render(idx: list[int]):
+        started = time.perf_counter()
+        rc = subprocess.run(_batch_command(video_path, [clips[i] for i in idx], audio, threads)).returncode
+        elapsed = time.perf_counter() - started
+        for i in idx:
+            results[i] = {
+                "mode": "batch",
+                "seconds": round(elapsed / len(idx), 3),
+                "batch_seconds": round(elapsed, 3),
+                "ok": rc == 0,
+            }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(_render, groups))
+
+    failed = [i for i, result in enumerate(results) if not result["ok"]]
+    if failed:
+        print(f"⚠️ {len(failed)} corte(s) de grupos com falha no ffmpeg; refazendo um a um")
+        retried = render_clips(video_path, [clips[i] for i in failed], workers=workers)
+        for i, result in zip(failed, retried):
+            results[i] = {**result, "batch_failed": True}
+    return results
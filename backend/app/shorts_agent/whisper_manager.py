@@ -0,0 +1,143 @@
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from faster_whisper import WhisperModel
+
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.getenv(
+    "WHISPER_COMPUTE_TYPE", "int8" if WHISPER_DEVICE == "cpu" else "float16"
+)
+# Quantas transcrições rodam ao mesmo tempo; as demais esperam na fila.
+WHISPER_MAX_CONCURRENT = int(os.getenv("WHISPER_MAX_CONCURRENT", "1"))
+# Threads por transcrição; por padrão os núcleos são divididos entre as transcrições.
+WHISPER_THREADS = int(
+    os.getenv("WHISPER_THREADS", str(max(1, (os.cpu_count() or 1) // WHISPER_MAX_CONCURRENT)))
+)
+# Segundos sem uso até descarregar o modelo (0 = nunca).
+WHISPER_IDLE_UNLOAD = float(os.getenv("WHISPER_IDLE_UNLOAD", "900"))
+
+
+class WhisperModelManager:
+    """
+    Carrega o faster-whisper uma vez por processo e limita as transcrições
+    simultâneas para que vários uploads de aula não disputem a CPU.
+    """
+
+    def __init__(
+        self,
+        size: str = WHISPER_MODEL_SIZE,
+        device: str = WHISPER_DEVICE,
+        compute_type: str = WHISPER_COMPUTE_TYPE,
+        cpu_threads: int = WHISPER_THREADS,
+        max_concurrent: int = WHISPER_MAX_CONCURRENT,
+        idle_unload: float = WHISPER_IDLE_UNLOAD,
+    ):
+        self.size = size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.max_concurrent = max_concurrent
+        self.idle_unload = idle_unload
+        self._model: Optional[WhisperModel] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._in_use = 0
+        self._last_used = time.monotonic()
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_lock = threading.Lock()
+        self._idle_hooks: list[Callable[[], bool]] = []
+
+    def _load(self) -> WhisperModel:
+        with self._lock:
+            if self._model is None:
+                started = time.perf_counter()
+                self._model = WhisperModel(
+                    self.size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.max_concurrent,
+                )
+                print(
+                    f"🎙️ Whisper '{self.size}' ({self.compute_type}) carregado em "
+                    f"{time.perf_counter() - started:.1f}s"
+                )
+                self._start_reaper()
+            return self._model
+
+    def preload(self):
+        self._load()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Reserva uma vaga de transcrição sem usar o modelo compartilhado (o modo
+        longo transcreve no seu pool de processos, mas na mesma fila e cota).
+        """
+        with self._slots:
+            with self._lock:
+                self._in_use += 1
+            self._start_reaper()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+                    self._last_used = time.monotonic()
+
+    @contextmanager
+    def acquire(self) -> Iterator[WhisperModel]:
+        """Reserva uma vaga de transcrição e entrega o modelo compartilhado."""
+        with self.slot():
+            yield self._load()
+
+    def add_idle_hook(self, hook: Callable[[], bool]):
+        """
+        `hook()` roda junto do descarregamento por ociosidade; True se liberou
+        algo. Roda com o `_lock` segurado, então não pode chamar o WHISPER.
+        """
+        self._idle_hooks.append(hook)
+
+    def unload_if_idle(self) -> bool:
+        # os hooks rodam sob o lock: quem entra em `slot()` durante o
+        # descarregamento espera, e só então pega (ou recria) o pool do modo longo
+        with self._lock:
+            idle = time.monotonic() - self._last_used
+            if self._in_use or idle < self.idle_unload:
+                return False
+            released = self._model is not None
+            self._model = None
+            for hook in self._idle_hooks:
+                released = hook() or released
+        if not released:
+            return False
+        gc.collect()
+        print(f"🎙️ Whisper descarregado após {idle:.0f}s ocioso")
+        return True
+
+    def _start_reaper(self):
+        # chamado com `_lock` já segurado por `_load`; por isso um lock próprio
+        with self._reaper_lock:
+            if not self.idle_unload or self._reaper is not None:
+                return
+
+            def _loop():
+                while True:
+                    time.sleep(min(60.0, self.idle_unload))
+                    self.unload_if_idle()
+
+            self._reaper = threading.Thread(target=_loop, name="whisper-reaper", daemon=True)
+            self._reaper.start()
+
+WHISPER = WhisperModelManager()
+
+
+def preload_whisper():
+    """Hook de startup: carrega o modelo já na subida se WHISPER_PRELOAD=1."""
+    if os.getenv("WHISPER_PRELOAD") == "1":
+        WHISPER.preload()
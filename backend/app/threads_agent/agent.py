@@ -1,10 +1,10 @@
 import json
 from pathlib import Path
-from google import generativeai as genai
-from app.config import GOOGLE_API_KEY
+from typing import AsyncIterator, Iterator
+from services.json_stream import aiter_json_array, iter_json_array
+from services.llm_gateway import GATEWAY
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-pro")
+THREAD_MODEL = "models/gemini-2.5-pro"
 
 
 def read_transcript(file_path: str) -> str:
@@ -12,8 +12,8 @@ def read_transcript(file_path: str) -> str:
         return f.read()
 
 
-def generate_thread_from_transcript(transcript: str) -> list[str]:
-    prompt = f"""
+def build_thread_prompt(transcript: str) -> str:
+    return f"""
 You are a content repurposing assistant. Given the transcript of a video, write a compelling X (Twitter) thread summarizing its core ideas, insights, or story.
 
 Each tweet:
@@ -30,19 +30,46 @@ Transcript:
 {transcript[:12000]}  # truncate if necessary
 """
 
+
+def iter_thread_from_transcript(transcript: str) -> Iterator[str]:
+    """Gera os tweets da thread um a um, à medida que o Gemini os completa."""
+    chunks = GATEWAY.stream(
+        build_thread_prompt(transcript), model=THREAD_MODEL, response_mime_type="application/json"
+    )
+    yield from iter_json_array(chunks)
+
+
+async def aiter_thread_from_transcript(transcript: str) -> AsyncIterator[str]:
+    chunks = GATEWAY.astream(
+        build_thread_prompt(transcript), model=THREAD_MODEL, response_mime_type="application/json"
+    )
+    async for tweet in aiter_json_array(chunks):
+        yield tweet
+
+
+def generate_thread_from_transcript(transcript: str) -> list[str]:
+    thread: list[str] = []
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={"response_mime_type": "application/json"}
-        )
-        raw_json = response.text.strip() if hasattr(response, "text") else ""
-        if not raw_json or not raw_json.startswith("["):
+        for tweet in iter_thread_from_transcript(transcript):
+            thread.append(tweet)
+        if not thread:
             raise ValueError("Invalid or empty response from Gemini")
+    except Exception as e:
+        # o que já chegou completo fica; só uma resposta vazia vira []
+        print("❌ Gemini thread generation error:", e)
+    return thread
 
-        return json.loads(raw_json)
+
+async def agenerate_thread_from_transcript(transcript: str) -> list[str]:
+    thread: list[str] = []
+    try:
+        async for tweet in aiter_thread_from_transcript(transcript):
+            thread.append(tweet)
+        if not thread:
+            raise ValueError("Invalid or empty response from Gemini")
     except Exception as e:
         print("❌ Gemini thread generation error:", e)
-        return []
+    return thread
 
 
 def save_thread(thread: list, output_dir: str, name: str):
@@ -58,9 +85,9 @@ def save_thread(thread: list, output_dir: str, name: str):
             text = tweet["text"] if isinstance(tweet, dict) else tweet
             f.write(text + "\n\n")
 
-def run_thread_agent(input_txt_path: str, output_dir: str = "app/threads_agent/outputs"):
+async def arun_thread_agent(input_txt_path: str, output_dir: str = "app/threads_agent/outputs"):
     transcript = read_transcript(input_txt_path)
-    thread = generate_thread_from_transcript(transcript)
+    thread = await agenerate_thread_from_transcript(transcript)
     if thread:
         filename = Path(input_txt_path).stem
         save_thread(thread, output_dir, filename)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from pathlib import Path
-from app.threads_agent.agent import run_thread_agent
+from app.threads_agent.agent import arun_thread_agent
 
 router = APIRouter()
 
@@ -17,7 +17,7 @@ async def generate_thread(req: ThreadRequest):
         raise HTTPException(status_code=404, detail="TXT file not found")
 
     try:
-        run_thread_agent(str(txt_path))
+        await arun_thread_agent(str(txt_path))
         return {"status": "ok", "message": f"Thread generated for {txt_path.name}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,64 @@
+"""
+Benchmark de latência do chat com um LLM falso: quebra o tempo de uma
+pergunta em busca, resposta, resumo e insight para cada CHAT_MODE, e compara
+com o tempo que as mesmas etapas levariam em sequência.
+
+Uso (de backend/):
+    python -m benchmarks.bench_chat --llm-latency 0.3 --retrieval-latency 0.1 --runs 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.agentic_chat import crew
+from benchmarks.fake_llm import FakeChatBackend, fake_retrieval
+from services.llm_gateway import GATEWAY
+
+STAGES = ("retrieval", "answer", "summary", "insight", "insight_summary")
+
+
+async def _bench(mode: str, runs: int) -> dict:
+    crew.CHAT_MODE = mode
+    await crew.run_chat("aquecimento")  # primeira execução inclui o carregamento do crewai
+    totals, stages = [], {stage: [] for stage in STAGES}
+    for i in range(runs):
+        started = time.perf_counter()
+        await crew.run_chat(f"pergunta {i} sobre derivadas")
+        totals.append(time.perf_counter() - started)
+        timings = crew.get_timings()
+        for stage in STAGES:
+            if stage in timings:
+                stages[stage].append(timings[stage])
+    return {
+        "total": statistics.median(totals),
+        **{stage: statistics.median(values) for stage, values in stages.items() if values},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="segundos por chamada ao LLM falso")
+    parser.add_argument("--retrieval-latency", type=float, default=0.1)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = FakeChatBackend(args.llm_latency)
+    GATEWAY.set_backend(backend)
+    crew.retrieve_context = fake_retrieval(args.retrieval_latency)
+
+    print(f"LLM falso: {args.llm_latency}s/chamada, busca: {args.retrieval_latency}s, mediana de {args.runs} execuções")
+    header = f"{'modo':<10}" + "".join(f"{stage:>17}" for stage in STAGES) + f"{'sequencial':>12}{'total':>9}"
+    print(header)
+    for mode in ("parallel", "combined"):
+        result = asyncio.run(_bench(mode, args.runs))
+        sequential = sum(result.get(stage, 0.0) for stage in STAGES)
+        cells = "".join(f"{result[stage]:>17.3f}" if stage in result else f"{'-':>17}" for stage in STAGES)
+        print(f"{mode:<10}{cells}{sequential:>12.3f}{result['total']:>9.3f}")
+        calls = backend.calls
+        backend.calls = 0
+        print(f"{'':<10}chamadas ao LLM por pergunta: {calls / (args.runs + 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
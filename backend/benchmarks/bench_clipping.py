@@ -0,0 +1,96 @@
+"""
+Benchmark de renderização de shorts: um ffmpeg por corte (`render_clips`)
+contra um ffmpeg por grupo de cortes (`render_clips_batched`).
+
+Uso (de backend/):
+    python -m benchmarks.bench_clipping                      # fonte sintética
+    python -m benchmarks.bench_clipping --source aula.mp4 --counts 10 30 60
+
+Sem --source, gera um vídeo de teste (testsrc + seno) com a duração pedida.
+FFMPEG_PATH/FFPROBE_PATH apontam para os binários se não estiverem em /usr/bin.
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from app.shorts_agent import utils
+
+
+def _synthetic_source(path: Path, seconds: float, size: str):
+    subprocess.run(
+        [
+            utils.FFMPEG_PATH, "-y", "-nostdin", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "250",
+            "-c:a", "aac", "-shortest", str(path),
+        ],
+        check=True,
+    )
+
+
+def _duration(path: Path) -> float:
+    proc = subprocess.run(
+        [utils.FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True,
+        text=True,
+    )
+    return float(proc.stdout.strip())
+
+
+def _segments(count: int, total: float, clip: float) -> list[tuple[float, float]]:
+    """`count` cortes de `clip` segundos espalhados pelo vídeo, fora dos keyframes."""
+    step = (total - clip) / max(1, count)
+    return [(round(i * step + 0.37, 3), round(i * step + 0.37 + clip, 3)) for i in range(count)]
+
+
+def _run(name: str, render, source: Path, segments, out_dir: Path) -> dict:
+    clips = [(start, end, str(out_dir / f"{name}_{i}.mp4")) for i, (start, end) in enumerate(segments)]
+    started = time.perf_counter()
+    results = render(str(source), clips)
+    wall = time.perf_counter() - started
+    return {"wall": wall, "ok": sum(r["ok"] for r in results), "total": len(clips)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, help="vídeo de entrada (padrão: sintético)")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--clip-seconds", type=float, default=8.0)
+    parser.add_argument("--source-seconds", type=float, default=600.0)
+    parser.add_argument("--size", default="640x360", help="resolução do vídeo sintético")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-clipping-") as tmp:
+        tmp = Path(tmp)
+        source = args.source
+        if source is None:
+            source = tmp / "source.mp4"
+            print(f"Gerando fonte sintética de {args.source_seconds:.0f}s ({args.size})...")
+            _synthetic_source(source, args.source_seconds, args.size)
+        total = _duration(source)
+        print(
+            f"fonte={source.name} duração={total:.0f}s workers={utils.CLIP_WORKERS} "
+            f"batch={utils.CLIP_BATCH_SIZE} cpus={os.cpu_count()}"
+        )
+        print(f"{'cortes':>6} {'por corte (s)':>14} {'em lote (s)':>12} {'ganho':>7}  ok")
+        for count in args.counts:
+            segments = _segments(count, total, args.clip_seconds)
+            single = _run("single", utils.render_clips, source, segments, tmp)
+            batched = _run("batch", utils.render_clips_batched, source, segments, tmp)
+            print(
+                f"{count:>6} {single['wall']:>14.2f} {batched['wall']:>12.2f} "
+                f"{single['wall'] / batched['wall']:>6.2f}x  "
+                f"{single['ok']}/{single['total']} {batched['ok']}/{batched['total']}"
+            )
+            for path in tmp.glob("single_*.mp4"):
+                path.unlink()
+            for path in tmp.glob("batch_*.mp4"):
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark de extração de PDFs: páginas/s de `iter_pdf_pages` com um processo
+(sequencial) e com o pool de `PDF_WORKERS` processos.
+
+Uso (de backend/):
+    python -m benchmarks.bench_pdf                           # PDF sintético
+    python -m benchmarks.bench_pdf --source apostila.pdf --workers 1 2 4 8
+
+Sem --source, gera um PDF de teste com texto em todas as páginas.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from pypdf import PageObject, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from services import pdf_extract
+
+_LINE = "Derivadas medem a taxa de variacao instantanea de uma funcao no ponto"
+
+
+def _synthetic_pdf(path: Path, pages: int, lines: int):
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for n in range(pages):
+        page = PageObject.create_blank_page(width=595, height=842)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        body = "".join(f"({_LINE} {n}.{i}) Tj T* " for i in range(lines))
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 9 Tf 11 TL 40 800 Td {body}ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        writer.add_page(page)
+    with open(path, "wb") as out:
+        writer.write(out)
+
+
+def _run(source: Path, workers: int) -> dict:
+    # o pool é criado com PDF_WORKERS na primeira chamada: recria a cada medição
+    if pdf_extract._pool is not None:
+        pdf_extract._pool.shutdown()
+        pdf_extract._pool = None
+    pdf_extract.PDF_WORKERS = workers
+    if workers > 1:
+        pdf_extract._get_pool().submit(int).result()  # sobe os processos fora da medição
+
+    started = time.perf_counter()
+    pages = chars = 0
+    for _, text in pdf_extract.iter_pdf_pages(str(source)):
+        pages += 1
+        chars += len(text)
+    wall = time.perf_counter() - started
+    return {"wall": wall, "pages": pages, "chars": chars}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, help="PDF de entrada (padrão: sintético)")
+    parser.add_argument("--pages", type=int, default=400, help="páginas do PDF sintético")
+    parser.add_argument("--lines", type=int, default=60, help="linhas de texto por página sintética")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, pdf_extract.PDF_WORKERS])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-pdf-") as tmp:
+        source = args.source
+        if source is None:
+            source = Path(tmp) / "source.pdf"
+            print(f"Gerando PDF sintético de {args.pages} páginas...")
+            _synthetic_pdf(source, args.pages, args.lines)
+        total = pdf_extract.count_pages(str(source))
+        print(
+            f"fonte={source.name} páginas={total} faixa={pdf_extract.PAGES_PER_TASK} "
+            f"mínimo p/ paralelo={pdf_extract.PARALLEL_MIN_PAGES} cpus={os.cpu_count()}"
+        )
+        print(f"{'workers':>7} {'tempo (s)':>10} {'páginas/s':>10} {'ganho':>7}")
+        base = None
+        for workers in args.workers:
+            result = _run(source, workers)
+            rate = result["pages"] / result["wall"]
+            base = base or rate
+            print(f"{workers:>7} {result['wall']:>10.2f} {rate:>10.1f} {rate / base:>6.2f}x")
+        if pdf_extract._pool is not None:
+            pdf_extract._pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""LLM falso para benchmarks: responde cada task do chat após uma latência fixa."""
+import asyncio
+import json
+import random
+import re
+
+from services.context_budget import PackedContext
+from services.llm_gateway import LLMResult
+
+_QUESTION = re.compile(r'pergunta \\?"(.*?)\\?"', re.S)
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(part for message in contents for part in message["parts"])
+
+
+class FakeChatBackend:
+    """
+    Backend do LLMGateway que reconhece a task pelo prompt (resposta, insight,
+    resumo, insight+resumo) e devolve saída no formato que o crewai espera.
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter  # latência extra aleatória, para embaralhar a ordem das respostas
+        self.calls = 0
+
+    def _delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter)
+
+    def reply(self, prompt: str) -> str:
+        match = _QUESTION.search(prompt)
+        question = match.group(1) if match else ""
+        if '"resumo"' in prompt:
+            body = json.dumps({"tema": f"tema de {question}", "dificuldade": "medio", "resumo": f"resumo de {question}"})
+        elif '"dificuldade"' in prompt:
+            body = json.dumps({"tema": f"tema de {question}", "dificuldade": "medio"})
+        elif "mensagem resumida" in prompt:
+            answer = prompt.split("Resposta:\n", 1)[-1].split("\n", 1)[0]
+            body = f"resumo de [{answer}]"
+        else:
+            body = f"resposta para {question}"
+        return f"Thought: I now can give a great answer\nFinal Answer: {body}"
+
+    async def generate(self, model, contents, system, config) -> LLMResult:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return LLMResult(self.reply(_prompt_text(contents)), prompt_tokens=100, output_tokens=20)
+
+    async def stream(self, model, contents, system, config):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        text = self.reply(_prompt_text(contents)).split("Final Answer: ", 1)[-1]
+        for word in text.split(" "):
+            await asyncio.sleep(0.005)
+            yield LLMResult(word + " ", prompt_tokens=100, output_tokens=1)
+
+
+def fake_retrieval(latency: float = 0.1):
+    """Substituto de `retrieve_context` que só espera `latency` segundos."""
+    import time
+
+    def _retrieve(question: str, course_id: str = "", k: int = 5) -> PackedContext:
+        time.sleep(latency)
+        return PackedContext(
+            text=f"[1] (aula.pdf, p. 1)\nMaterial sobre {question}",
+            sources=[{"n": 1, "src": "aula.pdf", "page": 1}],
+            stats={"kept": 1, "tokens_out": 12},
+        )
+
+    return _retrieve
@@ -10,15 +10,29 @@ from app.shorts_agent.routes import router as shorts_router
 from app.threads_agent.routes import router as threads_router
 from app.chat import router as chat_router
 from models.database import Base, engine
+from sqlalchemy import text
+from services.ingest_jobs import start_workers as start_ingest_workers
+from app.shorts_agent.whisper_manager import preload_whisper
+from services.lesson_pipeline import resume_pending_lessons
 from dotenv import load_dotenv
 
 load_dotenv(".env")
 
 import models
 
+# create_all não altera tabelas que já existem; colunas novas entram aqui
+# (idempotente: roda a cada subida).
+SCHEMA_UPGRADES = [
+    "ALTER TABLE lessons ADD COLUMN IF NOT EXISTS processing_status VARCHAR(32)",
+    "ALTER TABLE lessons ADD COLUMN IF NOT EXISTS processing JSON",
+    "ALTER TABLE lessons ADD COLUMN IF NOT EXISTS processing_error TEXT",
+]
+
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
 
 class CORStaticFiles(StaticFiles):
     async def get_response(self, path, scope):
@@ -31,7 +45,7 @@ class CORStaticFiles(StaticFiles):
 app = FastAPI(
     title="FastPay API",
     version="0.1.0",
-    on_startup=[create_tables],
+    on_startup=[create_tables, start_ingest_workers, preload_whisper, resume_pending_lessons],
 )
 
 app.add_middleware(
@@ -23,6 +23,14 @@ class Lesson(Base):
         default=dict
     )
 
+    # pipeline de vídeo: status atual, resultados/tempos de cada estágio e erro
+    processing_status: Mapped[Optional[str]] = mapped_column(String(32))
+    processing: Mapped[dict] = mapped_column(
+        MutableDict.as_mutable(JSON),
+        default=dict
+    )
+    processing_error: Mapped[Optional[str]] = mapped_column(Text)
+
     files: Mapped[list["File"]] = relationship(
         back_populates="lesson", cascade="all, delete-orphan"
     )
\ No newline at end of file
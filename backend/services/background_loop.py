@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    Event loop próprio numa thread daemon, criado sob demanda.
+
+    Clientes assíncronos com estado (semáforos, pools HTTP) ficam presos a um
+    único loop; com isto, código síncrono (workers, tools do crewai) e rotas
+    async de qualquer loop podem compartilhá-los.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Executa `coro` no loop de fundo e bloqueia a thread chamadora até o fim."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def arun(self, coro: Awaitable[T]) -> T:
+        """Executa `coro` no loop de fundo sem bloquear o loop de quem chama."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
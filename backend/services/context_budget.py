@@ -0,0 +1,131 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from services.hybrid_search import Passage, merge_overlapping
+from services.lexical_index import fold, query_terms, term_weight
+
+# Teto de tokens do contexto enviado ao LLM (a saída já é limitada em 2048).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Trechos do topo que entram inteiros; os demais podem virar frases extraídas.
+CONTEXT_FULL_PASSAGES = int(os.getenv("CONTEXT_FULL_PASSAGES", "2"))
+CONTEXT_COMPRESS = os.getenv("CONTEXT_COMPRESS", "1") == "1"
+CONTEXT_MAX_SENTENCES = 3
+# Fração de 5-gramas de palavras do menor trecho que já aparecem no outro.
+NEAR_DUP_THRESHOLD = 0.8
+
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimativa local de tokens (sem chamar a API): cada pontuação conta 1 e
+    cada palavra 1 mais 1 a cada 6 letras, o que acompanha o tokenizer do
+    Gemini em português com folga.
+    """
+    return sum(1 + len(tok) // 6 for tok in _TOKEN.findall(text))
+
+
+def _shingles(text: str, n: int = 5) -> set:
+    words = fold(text).split()
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def _near_duplicate(a: set, b: set) -> bool:
+    if not a or not b:
+        return False
+    # coeficiente de sobreposição: pega também o trecho quase contido num maior
+    return len(a & b) / min(len(a), len(b)) >= NEAR_DUP_THRESHOLD
+
+
+def compress(text: str, query: str, max_sentences: int = CONTEXT_MAX_SENTENCES) -> str:
+    """Resumo extrativo: as frases com mais peso de termos da pergunta, na ordem original."""
+    sentences = [s for s in _SENTENCE.split(text.strip()) if s]
+    if len(sentences) <= max_sentences:
+        return text
+    terms = {fold(t) for t in query_terms(query)}
+    scored = [
+        (sum(term_weight(t) for t in terms & set(query_terms(fold(s)))), -i, i)
+        for i, s in enumerate(sentences)
+    ]
+    keep = sorted(i for *_, i in sorted(scored, reverse=True)[:max_sentences])
+    return " [...] ".join(sentences[i] for i in keep)
+
+
+def _citation(meta: dict) -> str:
+    label = str(meta.get("src") or "material do curso")
+    if meta.get("page") is not None:
+        label += f", p. {meta['page']}"
+    return label
+
+
+@dataclass
+class PackedContext:
+    text: str
+    sources: list = field(default_factory=list)
+    stats: dict = field(default_factory=dict)
+
+
+def pack_context(
+    passages: list[Passage],
+    query: str,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    full_passages: int = CONTEXT_FULL_PASSAGES,
+    compress_tail: Optional[bool] = None,
+) -> PackedContext:
+    """
+    Monta o contexto do LLM dentro de `budget` tokens, em ordem de relevância:
+    costura/descarta chunks sobrepostos, tira quase-duplicados, comprime os
+    trechos de baixo do ranking (se `compress_tail`) e numera cada trecho com
+    a fonte, para a resposta poder citar "[n]".
+    """
+    compress_tail = CONTEXT_COMPRESS if compress_tail is None else compress_tail
+    tokens_in = sum(count_tokens(p.text) for p in passages)
+
+    merged = merge_overlapping(passages)
+    unique: list[Passage] = []
+    seen: list[set] = []
+    for passage in merged:
+        shingles = _shingles(passage.text)
+        if any(_near_duplicate(shingles, other) for other in seen):
+            continue
+        seen.append(shingles)
+        unique.append(passage)
+
+    blocks, sources = [], []
+    used = compressed = skipped = 0
+    for rank, passage in enumerate(unique):
+        text = passage.text
+        if compress_tail and rank >= full_passages:
+            text = compress(text, query)
+        header = f"[{len(blocks) + 1}] ({_citation(passage.meta)})"
+        cost = count_tokens(header) + count_tokens(text)
+        if used + cost > budget and compress_tail and text == passage.text:
+            # não coube inteiro: tenta a versão extraída antes de desistir
+            text = compress(text, query)
+            cost = count_tokens(header) + count_tokens(text)
+        if used + cost > budget:
+            skipped += 1
+            continue
+        used += cost
+        compressed += text != passage.text
+        blocks.append(f"{header}\n{text}")
+        sources.append({"n": len(blocks), "id": passage.id, "score": round(passage.score, 4), **passage.meta})
+
+    return PackedContext(
+        text="\n\n---\n\n".join(blocks),
+        sources=sources,
+        stats={
+            "candidates": len(passages),
+            "merged": len(passages) - len(merged),
+            "near_duplicates": len(merged) - len(unique),
+            "compressed": compressed,
+            "skipped": skipped,
+            "kept": len(blocks),
+            "tokens_in": tokens_in,
+            "tokens_out": used,
+            "budget": budget,
+        },
+    )
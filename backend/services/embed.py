@@ -1,18 +1,19 @@
 import os
+import threading
 from typing import List
 
 from google import genai
-from langchain.vectorstores import Chroma
 
-import asyncio, random
-from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_if_exception_type
+import asyncio
+from tenacity import AsyncRetrying, wait_random_exponential, stop_after_attempt, retry_if_exception_type
 from google.genai import errors as gerrors
 
 from langchain_core.embeddings import Embeddings
 
 import time
 
-from services.ingest import CHROMA_CLIENT
+from services.background_loop import BackgroundLoop
+from services.embed_cache import EMBED_CACHE, QUERY_CACHE, EmbeddingCache, text_hash
 
 api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
@@ -21,52 +22,209 @@ if not api_key:
 client = genai.Client(api_key=api_key)
 
 _MODEL_NAME = "gemini-embedding-exp-03-07"
-_MAX_BATCH = 100
-
 
 _MAX_BATCH = 32
-_MIN_DELAY = 2.5
-_JITTER    = 1.0
+_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+_RATE = float(os.getenv("EMBED_RATE", "1.0"))       # requisições/s no regime normal
+_BURST = float(os.getenv("EMBED_BURST", "4"))
+_MIN_RATE = 0.05
 
-@retry(
+_RETRY = dict(
     retry=retry_if_exception_type(gerrors.ClientError),
     wait=wait_random_exponential(multiplier=2, max=60),
     stop=stop_after_attempt(6),
 )
-def _gemini_call(chunk):
-    return client.models.embed_content(
-        model=_MODEL_NAME,
-        contents=chunk,
-    )
 
-def embed_batch(texts: list[str]) -> list[list[float]]:
-    vecs: list[list[float]] = []
-    for i in range(0, len(texts), _MAX_BATCH):
-        part = texts[i : i + _MAX_BATCH]
 
-        resp = _gemini_call(part)          # sync
-        vecs.extend([e.values for e in resp.embeddings])
+class _TokenBucket:
+    """
+    Token bucket adaptativo: a taxa cai pela metade a cada 429 e volta a subir
+    aos poucos (10% por sucesso) até a taxa configurada.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Consome um token e devolve quanto tempo esperar por ele."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(_MIN_RATE, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    return getattr(exc, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+class EmbeddingEngine:
+    """
+    Motor assíncrono de embeddings.
+
+    Roda num event loop próprio (thread daemon), de modo que chamadas síncronas
+    (`embed`) e assíncronas (`aembed`) de qualquer thread ou loop compartilham o
+    mesmo semáforo de concorrência, o mesmo rate limiter e o mesmo cliente HTTP.
+    """
+
+    def __init__(
+        self,
+        model: str = _MODEL_NAME,
+        max_batch: int = _MAX_BATCH,
+        concurrency: int = _CONCURRENCY,
+        rate: float = _RATE,
+        burst: float = _BURST,
+        cache: EmbeddingCache | None = EMBED_CACHE,
+    ):
+        self.model = model
+        self.cache = cache
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self.bucket = _TokenBucket(rate, burst)
+        self._runner = BackgroundLoop("embedding-engine")
+        self._sem: asyncio.Semaphore | None = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "busy_seconds": 0.0,
+        }
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    async def _attempt(self, chunk: list[str]):
+        await self.bucket.acquire()
+        try:
+            resp = await client.aio.models.embed_content(model=self.model, contents=chunk)
+        except gerrors.ClientError as exc:
+            if _is_rate_limited(exc):
+                self.bucket.throttle()
+                self._count(throttled=1)
+            raise
+        self.bucket.recover()
+        return resp
+
+    async def _call(self, chunk: list[str]):
+        # retry com backoff (`_RETRY`) sem bloquear a thread
+        async with self._sem:
+            async for attempt in AsyncRetrying(**_RETRY):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        self._count(retries=1)
+                    resp = await self._attempt(chunk)
+        self._count(requests=1, texts=len(chunk))
+        return [e.values for e in resp.embeddings]
+
+    async def _embed(self, texts: list[str]) -> list[list[float]]:
+        """Consulta o cache e só manda para a API os textos únicos ainda não vistos."""
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model, hashes) if self.cache else {}
+
+        pending: dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                pending.setdefault(h, t)
+
+        if pending:
+            vecs = await self._embed_remote(list(pending.values()))
+            fresh = dict(zip(pending, vecs))
+            if self.cache:
+                self.cache.put_many(self.model, fresh)
+            found.update(fresh)
+        return [found[h] for h in hashes]
+
+    async def _embed_remote(self, texts: list[str]) -> list[list[float]]:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        parts = [texts[i : i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+        try:
+            results = await asyncio.gather(*(self._call(p) for p in parts))
+        except Exception:
+            self._count(failures=1)
+            raise
+        finally:
+            self._count(busy_seconds=time.perf_counter() - started)
+        return [vec for part in results for vec in part]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Versão síncrona; bloqueia a thread chamadora até terminar."""
+        if not texts:
+            return []
+        return self._runner.run(self._embed(list(texts)))
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return await self._runner.arun(self._embed(list(texts)))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        busy = stats["busy_seconds"]
+        stats["texts_per_second"] = stats["texts"] / busy if busy else 0.0
+        stats["current_rate"] = self.bucket.rate
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+ENGINE = EmbeddingEngine()
+
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    return ENGINE.embed(texts)
 
-        time.sleep(_MIN_DELAY + random.random() * _JITTER)  # sync sleep
-    return vecs
 
 class GeminiEmbeddings(Embeddings):
+    """Embeddings do LangChain; consultas passam antes por um LRU/TTL em memória."""
+
     def embed_documents(self, texts):
-        return embed_batch(texts)
+        return ENGINE.embed(texts)
     def embed_query(self, text):
-        return embed_batch([text])[0]
+        key = (ENGINE.model, text_hash(text))
+        vec = QUERY_CACHE.get(key)
+        if vec is None:
+            vec = ENGINE.embed([text])[0]
+            QUERY_CACHE.put(key, vec)
+        return vec
+    async def aembed_documents(self, texts):
+        return await ENGINE.aembed(texts)
+    async def aembed_query(self, text):
+        key = (ENGINE.model, text_hash(text))
+        vec = QUERY_CACHE.get(key)
+        if vec is None:
+            vec = (await ENGINE.aembed([text]))[0]
+            QUERY_CACHE.put(key, vec)
+        return vec
 
 
 _EMBED = GeminiEmbeddings()
-
-def get_retriever(k: int = 8):
-    """
-    Configura um retriever para buscar trechos relevantes usando Gemini embeddings.
-    """
-    vectorstore = Chroma(
-        collection_name="global_collection",
-        embedding_function=_EMBED,
-        client=CHROMA_CLIENT,
-    )
-    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
-    return retriever
@@ -0,0 +1,146 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from services.embed import _EMBED
+from services.ingest import GLOBAL_COLLECTION_NAME, cached_collection
+from services.lexical_index import LEXICAL, fold, query_terms, term_weight
+
+# Candidatos buscados em cada índice antes da fusão, e trechos entregues ao LLM.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "5"))
+RRF_K = 60  # constante usual da reciprocal-rank fusion
+# Peso da cobertura de termos da pergunta no re-ranking (0 = só a fusão).
+RERANK_TERM_WEIGHT = float(os.getenv("RERANK_TERM_WEIGHT", "0.5"))
+MIN_OVERLAP_CHARS = 50  # abaixo disso é coincidência, não a sobreposição do splitter
+
+
+@dataclass
+class Passage:
+    id: str
+    text: str
+    meta: dict
+    score: float = 0.0
+
+
+def _vector_candidates(collection, count: int, query: str, n: int, where: Optional[dict] = None) -> list[Passage]:
+    if not count:
+        return []
+    res = collection.query(
+        query_embeddings=[_EMBED.embed_query(query)],
+        n_results=min(n, count),
+        where=where or None,
+        include=["documents", "metadatas"],
+    )
+    return [
+        Passage(chunk_id, doc, meta or {})
+        for chunk_id, doc, meta in zip(res["ids"][0], res["documents"][0], res["metadatas"][0])
+    ]
+
+
+def _lexical_candidates(name: str, query: str, n: int) -> list[Passage]:
+    return [Passage(chunk_id, text, meta) for chunk_id, text, meta, _ in LEXICAL.search(name, query, n)]
+
+
+def _fuse(*rankings: list[Passage]) -> list[Passage]:
+    """Reciprocal-rank fusion: soma 1/(RRF_K + posição) de cada lista."""
+    fused: dict[str, Passage] = {}
+    for ranking in rankings:
+        for rank, passage in enumerate(ranking):
+            entry = fused.setdefault(passage.id, Passage(passage.id, passage.text, passage.meta))
+            entry.score += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.values(), key=lambda p: p.score, reverse=True)
+
+
+def _rerank(query: str, passages: list[Passage]) -> list[Passage]:
+    """
+    Re-ranking barato em CPU: score da fusão normalizado + fração dos termos da
+    pergunta presentes no trecho, ponderada por `term_weight`.
+    """
+    terms = [fold(t) for t in query_terms(query)]
+    if not passages or not terms or not RERANK_TERM_WEIGHT:
+        return passages
+    weights = {t: term_weight(t) for t in terms}
+    total = sum(weights.values())
+    top = passages[0].score or 1.0
+    for passage in passages:
+        words = set(query_terms(fold(passage.text)))
+        coverage = sum(w for t, w in weights.items() if t in words) / total
+        passage.score = passage.score / top + RERANK_TERM_WEIGHT * coverage
+    return sorted(passages, key=lambda p: p.score, reverse=True)
+
+
+def _overlap(a: str, b: str) -> int:
+    """Tamanho do sufixo de `a` que é prefixo de `b` (sobreposição do splitter)."""
+    probe = b[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    idx = a.find(probe, max(0, len(a) - len(b)))
+    while idx != -1:
+        if b.startswith(a[idx:]):
+            return len(a) - idx
+        idx = a.find(probe, idx + 1)
+    return 0
+
+
+def _same_region(a: Passage, b: Passage) -> bool:
+    keys = ("lecture_id", "src", "page")
+    return all(a.meta.get(k) == b.meta.get(k) for k in keys)
+
+
+def merge_overlapping(passages: list[Passage]) -> list[Passage]:
+    """
+    Junta chunks vizinhos do mesmo trecho de origem num só, sem repetir os
+    ~120 caracteres de sobreposição, e descarta trechos contidos em outros.
+    O trecho costurado fica com o maior score entre as partes.
+    """
+    merged: list[Passage] = []
+    for passage in passages:
+        current = Passage(passage.id, passage.text, passage.meta, passage.score)
+        i = 0
+        while current is not None and i < len(merged):
+            other = merged[i]
+            if current.text in other.text:
+                current = None
+                break
+            text = None
+            if _same_region(current, other):
+                if other.text in current.text:
+                    text = current.text
+                elif n := _overlap(other.text, current.text):
+                    text = other.text + current.text[n:]
+                elif n := _overlap(current.text, other.text):
+                    text = current.text + other.text[n:]
+            if text is None:
+                i += 1
+                continue
+            # absorve `other` e recomeça contra os demais
+            current = Passage(f"{other.id}+{current.id}", text, other.meta, max(other.score, current.score))
+            del merged[i]
+            i = 0
+        if current is not None:
+            merged.append(current)
+    return sorted(merged, key=lambda p: p.score, reverse=True)
+
+
+def hybrid_search(
+    query: str,
+    collection: str = GLOBAL_COLLECTION_NAME,
+    k: int = HYBRID_TOP_K,
+    candidates: int = HYBRID_CANDIDATES,
+    where: Optional[dict] = None,
+) -> list[Passage]:
+    """
+    Busca híbrida: top-N vetorial (Chroma) + top-N BM25 (FTS5), fundidos por
+    RRF, re-rankeados pela cobertura de termos e com chunks sobrepostos
+    costurados. Devolve no máximo `k` trechos, do mais ao menos relevante.
+    """
+    store, count = cached_collection(collection)
+    if store is None:  # coleção nunca indexada: nada a buscar (e nada é criado)
+        return []
+    vector = _vector_candidates(store, count, query, candidates, where)
+    lexical = _lexical_candidates(collection, query, candidates)
+    if where:
+        lexical = [p for p in lexical if all(p.meta.get(key) == value for key, value in where.items())]
+    ranked = _rerank(query, _fuse(vector, lexical))
+    return merge_overlapping(ranked[: k * 2])[:k]
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+REGISTRY_PATH = Path(os.getenv("INDEX_REGISTRY_PATH", "data/index_fingerprints.sqlite3"))
+
+
+@dataclass
+class SourceFingerprint:
+    digest: str
+    chunk_ids: list[str]
+    indexed_at: float
+
+
+class FingerprintStore:
+    """
+    Fingerprints das fontes já indexadas: (coleção, aula, fonte) → hash do
+    conteúdo + ids dos chunks gravados no Chroma. É o que permite pular arquivos
+    inalterados e apagar chunks que sumiram de uma versão para a outra. Guarda
+    também a versão de conteúdo de cada coleção, compartilhada entre processos.
+    """
+
+    def __init__(self, path: Path = REGISTRY_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    collection  TEXT NOT NULL,
+                    lecture_id  TEXT NOT NULL,
+                    source      TEXT NOT NULL,
+                    digest      TEXT NOT NULL,
+                    chunk_ids   TEXT NOT NULL,
+                    indexed_at  REAL NOT NULL,
+                    PRIMARY KEY (collection, lecture_id, source)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS content_versions (
+                    collection  TEXT PRIMARY KEY,
+                    version     INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get(self, collection: str, lecture_id: Optional[str], source: str) -> Optional[SourceFingerprint]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, chunk_ids, indexed_at FROM sources "
+                "WHERE collection = ? AND lecture_id = ? AND source = ?",
+                (collection, lecture_id or "", source),
+            ).fetchone()
+        if row is None:
+            return None
+        return SourceFingerprint(digest=row[0], chunk_ids=json.loads(row[1]), indexed_at=row[2])
+
+    def put(self, collection: str, lecture_id: Optional[str], source: str, digest: str, chunk_ids: list[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (collection, lecture_id, source, digest, chunk_ids, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (collection, lecture_id or "", source, digest, json.dumps(chunk_ids), time.time()),
+            )
+            self._conn.commit()
+
+    def list_prefix(
+        self, collection: str, lecture_id: Optional[str], prefix: str
+    ) -> list[tuple[str, SourceFingerprint]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, digest, chunk_ids, indexed_at FROM sources "
+                "WHERE collection = ? AND lecture_id = ? AND substr(source, 1, ?) = ?",
+                (collection, lecture_id or "", len(prefix), prefix),
+            ).fetchall()
+        return [
+            (row[0], SourceFingerprint(digest=row[1], chunk_ids=json.loads(row[2]), indexed_at=row[3]))
+            for row in rows
+        ]
+
+    def delete(self, collection: str, lecture_id: Optional[str], source: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sources WHERE collection = ? AND lecture_id = ? AND source = ?",
+                (collection, lecture_id or "", source),
+            )
+            self._conn.commit()
+
+    def version(self, *collections: str) -> int:
+        """Soma das versões de conteúdo das coleções (0 para as nunca indexadas)."""
+        with self._lock:
+            (version,) = self._conn.execute(
+                "SELECT COALESCE(SUM(version), 0) FROM content_versions "
+                f"WHERE collection IN ({', '.join('?' * len(collections))})",
+                collections,
+            ).fetchone()
+        return version
+
+    def bump_version(self, collection: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO content_versions (collection, version) VALUES (?, 1) "
+                "ON CONFLICT (collection) DO UPDATE SET version = version + 1",
+                (collection,),
+            )
+            self._conn.commit()
+
+
+FINGERPRINTS = FingerprintStore()
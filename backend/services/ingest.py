@@ -1,8 +1,15 @@
 import asyncio
-from uuid import uuid4
-from typing import List, Optional
+import hashlib
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional
 
 import chromadb
+from chromadb.errors import ChromaError
 from fastapi import UploadFile
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
@@ -14,63 +21,400 @@ CHROMA_CLIENT = chromadb.PersistentClient(path="data/chroma")
 
 GLOBAL_COLLECTION_NAME = "global_collection"
 
-from services.embed import embed_batch
+
+def collection_for_course(course_id: Optional[str]) -> str:
+    """
+    Cada curso tem a própria coleção, então a busca escala com o tamanho do curso
+    e não da plataforma. Sem curso, cai na coleção global (conteúdo legado).
+    """
+    if course_id in (None, ""):
+        return GLOBAL_COLLECTION_NAME
+    return f"course_{course_id}"
+
+
+def open_collection(name: str):
+    """Coleção já existente, ou None; buscas não criam coleções vazias."""
+    try:
+        return CHROMA_CLIENT.get_collection(name=name)
+    except (ValueError, ChromaError):  # ValueError no chromadb 0.5, NotFoundError depois
+        return None
+
+
+# Handle e nº de chunks de cada coleção, reaproveitados entre perguntas; a
+# entrada cai quando a versão da coleção muda (_bump_content_version, inclusive
+# em outro processo).
+_HANDLES: dict[str, tuple[int, Any, int]] = {}
+_HANDLES_LOCK = threading.Lock()
+
+
+def cached_collection(name: str) -> tuple[Any, int]:
+    """
+    (coleção, nº de chunks) para as buscas, sem ir ao Chroma a cada pergunta.
+    Coleção inexistente vem como (None, 0). Na primeira abertura o índice
+    léxico da coleção também é conferido.
+    """
+    version = FINGERPRINTS.version(name)
+    with _HANDLES_LOCK:
+        hit = _HANDLES.get(name)
+    if hit is not None and hit[0] == version:
+        return hit[1], hit[2]
+    collection = open_collection(name)
+    count = collection.count() if collection is not None else 0
+    if collection is not None:
+        LEXICAL.ensure_built(name, collection)
+    with _HANDLES_LOCK:
+        _HANDLES[name] = (version, collection, count)
+    return collection, count
+
+
+def search_collection_for_course(course_id: Optional[str]) -> str:
+    """
+    Coleção onde o chat do curso busca. Tudo que foi indexado antes da partição
+    por curso está em `global_collection`, sem `course_id` nos metadados, então
+    um curso que ainda não tem coleção própria (ou a tem vazia) continua lendo
+    a global. Reenviar o material pelo /ingest com o `course_id` cria a coleção
+    do curso, e a partir daí a global deixa de ser consultada para ele.
+    """
+    name = collection_for_course(course_id)
+    if name != GLOBAL_COLLECTION_NAME and not cached_collection(name)[1]:
+        return GLOBAL_COLLECTION_NAME
+    return name
+
+
+def content_version(course_id: Optional[str] = None) -> int:
+    """
+    Versão do conteúdo indexado que o chat do curso lê; caches de respostas
+    comparam contra ela. Fica no SQLite do registro de fingerprints, então uma
+    ingestão em qualquer processo invalida os caches de todos.
+    """
+    # soma a global: o chat de um curso sem coleção própria lê a global
+    name = collection_for_course(course_id)
+    if name == GLOBAL_COLLECTION_NAME:
+        return FINGERPRINTS.version(name)
+    return FINGERPRINTS.version(GLOBAL_COLLECTION_NAME, name)
+
+
+def _bump_content_version(course_id: Optional[str] = None):
+    key = collection_for_course(course_id)
+    FINGERPRINTS.bump_version(key)
+    with _HANDLES_LOCK:
+        _HANDLES.pop(key, None)
+
+from services.embed import ENGINE, embed_batch
+from services.embed_cache import text_hash
+from services.index_registry import FINGERPRINTS
+from services.lexical_index import LEXICAL
+from services.web_fetch import fetch_texts
+
+ProgressFn = Callable[[str, int, float], None]
+
+# Textos enviados no corpo são a fonte "inline:<posição>" da aula: reenviar o
+# texto editado na mesma posição reindexa a fonte e apaga os chunks que sumiram.
+INLINE_PREFIX = "inline:"
+# Chunks por lote de embed/upsert; 128 = 4 requisições de 32 em paralelo no engine.
+INGEST_BATCH = int(os.getenv("INGEST_BATCH", "128"))
+# Quantos lotes já chunkados podem esperar pelo embed antes de a extração pausar.
+INGEST_PREFETCH = int(os.getenv("INGEST_PREFETCH", "2"))
+
 
 def process_and_index(
+    course_id: Optional[str],
     lecture_id: Optional[str],
     files: List[UploadFile],
     raw_texts: List[str],
     links: List[str],
+    progress: Optional[ProgressFn] = None,
 ):
-    docs, metas = [], []
+    """
+    Pipeline em streaming: extrai página a página → divide em chunks → embeda em
+    lotes → grava no Chroma lote a lote. A memória fica limitada a alguns lotes
+    e o que já foi gravado sobrevive a uma falha no meio do upload.
+
+    A indexação é incremental: os ids dos chunks são determinísticos, fontes com
+    o mesmo fingerprint são puladas, chunks já presentes não são reembedados e
+    os que sumiram da nova versão de um arquivo são apagados ao final.
+
+    `progress(stage, count, seconds)` é chamado a cada passo com os estágios
+    "fetched", "extracted", "chunked", "embedded", "indexed", "unchanged" e
+    "deleted"
+    (pode vir de outra thread).
+    """
+    report = progress or _no_progress
+    collection_name = collection_for_course(course_id)
+    collection = CHROMA_CLIENT.get_or_create_collection(name=collection_name)
+    # o índice BM25 acompanha o Chroma; coleções antigas são copiadas antes
+    LEXICAL.ensure_built(collection_name, collection)
+    print(f"Indexando na coleção {collection_name}...")
+
+    sources: dict[str, _Source] = {}
+    changed_files = []
+    for key, up in zip(_file_keys(files), files):
+        src = _register_source(sources, collection_name, lecture_id, key, _file_digest(up))
+        if src is not None:
+            changed_files.append((key, up))
+    changed_texts = []
+    for i, txt in enumerate(raw_texts):
+        key = f"{INLINE_PREFIX}{i}"
+        src = _register_source(sources, collection_name, lecture_id, key, text_hash(txt))
+        if src is not None:
+            changed_texts.append((key, txt))
+    changed_links = []
+    started = time.perf_counter()
+    fetched = fetch_texts(links)
+    report("fetched", sum(1 for _, text in fetched if text is not None), time.perf_counter() - started)
+    for url, text in fetched:
+        if text is None:
+            continue
+        src = _register_source(sources, collection_name, lecture_id, url, text_hash(text))
+        if src is not None:
+            changed_links.append((url, text))
+    skipped = len(files) + len(raw_texts) + len(fetched) - len(sources)
+    if skipped:
+        print(f"  {skipped} fonte(s) sem alteração ou indisponíveis, puladas")
+    if raw_texts:
+        _retire_inline_sources(sources, collection_name, lecture_id, len(raw_texts))
+
+    chunks = _iter_chunks(course_id, lecture_id, changed_files, changed_texts, report, changed_links)
+    total = deleted = 0
+    try:
+        for batch in _prefetch(_batched(chunks, INGEST_BATCH), INGEST_PREFETCH):
+            ids, docs, metas = [], [], []
+            kept_ids, kept_docs, kept_metas = [], [], []
+            for key, doc, meta in batch:
+                chunk_id = _chunk_id(course_id, lecture_id, key, doc)
+                src = sources[key]
+                if chunk_id in src.new_ids:
+                    continue
+                src.new_ids.add(chunk_id)
+                if chunk_id in src.old_ids:
+                    # mesmo texto, mas a página pode ter mudado com a edição
+                    kept_ids.append(chunk_id)
+                    kept_docs.append(doc)
+                    kept_metas.append(meta)
+                    continue
+                ids.append(chunk_id)
+                docs.append(doc)
+                metas.append(meta)
+            report("unchanged", len(batch) - len(ids), 0.0)
+            if kept_ids:
+                # só metadados: sem reembedar
+                collection.update(ids=kept_ids, metadatas=kept_metas)
+                LEXICAL.add(collection_name, kept_ids, kept_docs, kept_metas)
+            if not ids:
+                continue
+
+            started = time.perf_counter()
+            embeds = embed_batch(docs)
+            report("embedded", len(docs), time.perf_counter() - started)
+
+            started = time.perf_counter()
+            collection.upsert(
+                ids=ids,
+                documents=docs,
+                embeddings=embeds,
+                metadatas=metas,
+            )
+            LEXICAL.add(collection_name, ids, docs, metas)
+            report("indexed", len(docs), time.perf_counter() - started)
+            total += len(docs)
+            print(f"  {total} chunks indexados")
+
+        # só com o stream completo dá para saber o que sumiu de cada fonte
+        for key, src in sources.items():
+            stale = src.old_ids - src.new_ids
+            if stale:
+                started = time.perf_counter()
+                collection.delete(ids=sorted(stale))
+                LEXICAL.delete(collection_name, sorted(stale))
+                report("deleted", len(stale), time.perf_counter() - started)
+                deleted += len(stale)
+            if src.retired:
+                FINGERPRINTS.delete(collection_name, lecture_id, key)
+            else:
+                FINGERPRINTS.put(collection_name, lecture_id, key, src.digest, sorted(src.new_ids))
+    finally:
+        if total or deleted:
+            _bump_content_version(course_id)
+    print(f"Embeddings: {ENGINE.stats()}")
+
 
+@dataclass
+class _Source:
+    digest: str
+    old_ids: set[str]
+    new_ids: set[str] = field(default_factory=set)
+    retired: bool = False  # fonte que saiu do conteúdo: todos os chunks viram stale
+
+
+def _register_source(sources, collection_name, lid, key, digest) -> Optional[_Source]:
+    """Registra a fonte para reindexação, ou devolve None se o fingerprint não mudou."""
+    prev = FINGERPRINTS.get(collection_name, lid, key)
+    if prev is not None and prev.digest == digest:
+        return None
+    src = _Source(digest=digest, old_ids=set(prev.chunk_ids) if prev else set())
+    sources[key] = src
+    return src
+
+
+def _retire_inline_sources(sources, collection_name, lid, count: int):
+    """
+    Os textos enviados substituem os textos da aula: posições além de `count`
+    e chaves antigas por hash do texto (antes da chave por posição) saem do
+    índice junto com seus chunks.
+    """
+    for key, prev in FINGERPRINTS.list_prefix(collection_name, lid, INLINE_PREFIX):
+        suffix = key[len(INLINE_PREFIX):]
+        if suffix.isdigit() and int(suffix) < count:
+            continue
+        sources[key] = _Source(digest="", old_ids=set(prev.chunk_ids), retired=True)
+
+
+def _file_keys(files: List[UploadFile]) -> list[str]:
+    """
+    Chave de cada arquivo (nome; repetições no mesmo upload viram "nome#2",
+    "nome#3"...), para que arquivos homônimos não compartilhem fingerprint nem
+    apaguem os chunks um do outro.
+    """
+    seen: dict[str, int] = {}
+    keys = []
     for up in files:
-        text = _extract_text_from_file(up)
-        _append_chunks(text, docs, metas, lecture_id, up.filename, "file")
+        seen[up.filename] = seen.get(up.filename, 0) + 1
+        n = seen[up.filename]
+        keys.append(up.filename if n == 1 else f"{up.filename}#{n}")
+    return keys
 
-    for txt in raw_texts:
-        _append_chunks(txt, docs, metas, lecture_id, "inline", "raw")
 
-    print(f"Indexando {len(docs)} documentos na coleção global...")
+def _chunk_id(cid, lid, src, chunk: str) -> str:
+    raw = f"{cid or ''}|{lid or ''}|{src}|{text_hash(chunk)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
 
-    collection = CHROMA_CLIENT.get_or_create_collection(name=GLOBAL_COLLECTION_NAME)
-    ids = [uuid4().hex for _ in docs]
-    embeds = embed_batch(docs)
-    collection.add(ids=ids, documents=docs, embeddings=embeds, metadatas=metas)
 
-def _append_chunks(text, docs, metas, lid, src, kind):
-    for chunk in TEXT_SPLITTER.split_text(text):
-        docs.append(chunk)
-        metas.append(
-            {
-                "lecture_id": lid,
-                "src": src,
-                "kind": kind,
-            }
-        )
+def _file_digest(up: UploadFile) -> str:
+    h = hashlib.sha256()
+    up.file.seek(0)
+    while block := up.file.read(1024 * 1024):
+        h.update(block)
+    up.file.seek(0)
+    return h.hexdigest()
 
 
-def _extract_text_from_file(up: UploadFile) -> str:
+def _no_progress(stage: str, count: int, seconds: float):
+    pass
+
+
+def _timed(items: Iterable, stage: str, report: ProgressFn) -> Iterator:
+    """Reporta cada item de `items` como um passo de `stage`, com o tempo gasto nele."""
+    it = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        report(stage, 1, time.perf_counter() - started)
+        yield item
+
+
+def _iter_chunks(cid, lid, files, raw_texts, report: ProgressFn = _no_progress, links=()) -> Iterator[tuple[str, str, dict]]:
+    """
+    Gera (chave da fonte, chunk, metadados); `files` e `raw_texts` são pares
+    (chave, upload) e (chave, texto).
+    """
+    for key, up in files:
+        for page, text in _timed(_iter_file_pages(up), "extracted", report):
+            for chunk, meta in _split(text, cid, lid, key, "file", report, page=page):
+                yield key, chunk, meta
+
+    for key, txt in raw_texts:
+        for chunk, meta in _split(txt, cid, lid, "inline", "raw", report):
+            yield key, chunk, meta
+
+    for url, txt in links:
+        for chunk, meta in _split(txt, cid, lid, url, "link", report):
+            yield url, chunk, meta
+
+
+def _split(text, cid, lid, src, kind, report: ProgressFn = _no_progress, page: Optional[int] = None) -> Iterator[tuple[str, dict]]:
+    started = time.perf_counter()
+    chunks = TEXT_SPLITTER.split_text(text)
+    report("chunked", len(chunks), time.perf_counter() - started)
+    for chunk in chunks:
+        meta = {
+            "course_id": cid,
+            "lecture_id": lid,
+            "src": src,
+            "kind": kind,
+        }
+        if page is not None:
+            meta["page"] = page
+        yield chunk, meta
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _prefetch(items: Iterable, maxsize: int) -> Iterator:
+    """
+    Consome `items` numa thread produtora com fila limitada: a extração/chunking
+    do próximo lote corre enquanto o atual é embedado, e para quando a fila enche.
     """
-    Roube um extrator adequado conforme o MIME:
-    - PDF  → pypdf
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in items:
+                if not _put((None, item)):
+                    return
+        except BaseException as exc:
+            _put((exc, None))
+            return
+        _put((None, done))
+
+    threading.Thread(target=_produce, name="ingest-prefetch", daemon=True).start()
+    try:
+        while True:
+            exc, item = q.get()
+            if exc is not None:
+                raise exc
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _iter_file_pages(up: UploadFile) -> Iterator[tuple[int, str]]:
+    """
+    Roube um extrator adequado conforme o MIME, página a página (página, texto):
+    - PDF  → pypdf (em paralelo quando o arquivo está em disco)
     - docx → python-docx
     - vídeo → whisper
     """
     suffix = up.filename.split(".")[-1].lower()
     if suffix == "pdf":
-        from pypdf import PdfReader
+        from services.pdf_extract import iter_pdf_pages
 
-        rdr = PdfReader(up.file)
-        return "\n".join(p.extract_text() or "" for p in rdr.pages)
+        path = getattr(up.file, "name", None)
+        source = path if isinstance(path, str) and os.path.isfile(path) else up.file
+        yield from iter_pdf_pages(source)
+        return
 
     raise ValueError(f"Formato não suportado: {suffix}")
 
 
-def _fetch_url_text(url: str) -> str:
-    import requests
-    from bs4 import BeautifulSoup
-
-    html = requests.get(url, timeout=10).text
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.get_text(" ", strip=True)
+def _extract_text_from_file(up: UploadFile) -> str:
+    return "\n".join(text for _, text in _iter_file_pages(up))
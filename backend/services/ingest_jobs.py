@@ -0,0 +1,364 @@
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+from uuid import uuid4
+
+import aiofiles
+from fastapi import UploadFile
+
+from services.ingest import process_and_index
+
+JOBS_DB_PATH = Path(os.getenv("INGEST_JOBS_DB", "data/ingest_jobs.sqlite3"))
+JOBS_DIR = Path(os.getenv("INGEST_JOBS_DIR", "data/ingest_jobs"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Por quanto tempo os arquivos de um job que falhou ficam em disco para retry.
+INGEST_FAILED_RETENTION_HOURS = float(os.getenv("INGEST_FAILED_RETENTION_HOURS", "24"))
+# Cada processo renova a cada INGEST_HEARTBEAT_SECONDS os jobs que está rodando;
+# um job 'running' sem renovação por 3 intervalos é de um processo que caiu.
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "30"))
+
+STAGES = ("extracted", "chunked", "embedded", "indexed")
+_FLUSH_EVERY = 1.0  # segundos entre gravações de progresso
+
+
+class IngestJobStore:
+    """
+    Fila persistente de jobs de ingestão numa tabela SQLite local, que pode ser
+    compartilhada por vários processos (workers do uvicorn) na mesma máquina.
+    """
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    id          TEXT PRIMARY KEY,
+                    course_id   TEXT,
+                    lecture_id  TEXT,
+                    status      TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    progress    TEXT NOT NULL DEFAULT '{}',
+                    error       TEXT,
+                    created_at  REAL NOT NULL,
+                    started_at  REAL,
+                    finished_at REAL,
+                    owner       TEXT,
+                    heartbeat   REAL
+                )
+                """
+            )
+            # bancos criados antes das colunas de dono/heartbeat
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingest_jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {column} {kind}")
+            self._conn.commit()
+
+    def create(self, job_id: str, course_id, lecture_id, payload: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, course_id, lecture_id, status, payload, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, course_id, lecture_id, json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+
+    def claim_next(self, owner: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # o UPDATE só vale se nenhum outro processo pegou o job antes
+                now = time.time()
+                cur = self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'running', started_at = ?, owner = ?, heartbeat = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (now, owner, now, row["id"]),
+                )
+                self._conn.commit()
+                if cur.rowcount == 1:
+                    return row
+
+    def set_progress(self, job_id: str, progress: dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id)
+            )
+            self._conn.commit()
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def retry(self, job_id: str) -> bool:
+        """Devolve um job que falhou para a fila, reaproveitando os arquivos salvos."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued', error = NULL, progress = '{}', "
+                "started_at = NULL, finished_at = NULL WHERE id = ? AND status = 'failed'",
+                (job_id,),
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def expire_failed(self, before: float) -> list[str]:
+        """Marca como 'expired' os jobs que falharam antes de `before` e devolve os ids."""
+        with self._lock:
+            ids = [
+                row["id"]
+                for row in self._conn.execute(
+                    "SELECT id FROM ingest_jobs WHERE status = 'failed' AND finished_at < ?", (before,)
+                )
+            ]
+            self._conn.executemany(
+                "UPDATE ingest_jobs SET status = 'expired' WHERE id = ?", [(job_id,) for job_id in ids]
+            )
+            self._conn.commit()
+            return ids
+
+    def heartbeat(self, job_ids: list[str]):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE ingest_jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), job_id) for job_id in job_ids],
+            )
+            self._conn.commit()
+
+    def requeue_stale(self, before: float) -> int:
+        """
+        Jobs 'running' sem heartbeat desde `before` (o processo que os rodava
+        caiu) voltam para a fila; os que outro processo vivo está rodando ficam.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued', owner = NULL "
+                "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+                (before,),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        started, finished = row["started_at"], row["finished_at"]
+        progress = json.loads(row["progress"])
+        for entry in progress.values():
+            entry["per_second"] = entry["count"] / entry["seconds"] if entry["seconds"] else None
+        return {
+            "id": row["id"],
+            "course_id": row["course_id"],
+            "lecture_id": row["lecture_id"],
+            "status": row["status"],
+            "progress": progress,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": started,
+            "finished_at": finished,
+            "elapsed_seconds": ((finished or time.time()) - started) if started else None,
+        }
+
+
+class _JobProgress:
+    """Acumula contagens e tempos por estágio e grava no máximo a cada `_FLUSH_EVERY`s."""
+
+    def __init__(self, store: IngestJobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.stages = {stage: {"count": 0, "seconds": 0.0} for stage in STAGES}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def __call__(self, stage: str, count: int, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += count
+            entry["seconds"] += seconds
+            if time.monotonic() - self._last_flush < _FLUSH_EVERY:
+                return
+            self._last_flush = time.monotonic()
+            snapshot = json.loads(json.dumps(self.stages))
+        self.store.set_progress(self.job_id, snapshot)
+
+    def flush(self):
+        with self._lock:
+            snapshot = json.loads(json.dumps(self.stages))
+        self.store.set_progress(self.job_id, snapshot)
+
+
+STORE = IngestJobStore()
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+_wakeup = threading.Event()
+_workers: list[threading.Thread] = []
+_workers_lock = threading.Lock()
+_active: set[str] = set()  # jobs que os workers deste processo estão rodando
+
+
+def start_workers(n: int = INGEST_WORKERS):
+    """Sobe o pool de workers (idempotente) e retoma jobs interrompidos."""
+    with _workers_lock:
+        if _workers:
+            return
+        _requeue_stale_jobs()
+        _expire_failed_jobs()
+        for i in range(n):
+            t = threading.Thread(target=_worker_loop, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+        t = threading.Thread(target=_heartbeat_loop, name="ingest-heartbeat", daemon=True)
+        t.start()
+        _workers.append(t)
+    _wakeup.set()
+
+
+def _worker_loop():
+    while True:
+        row = None
+        try:
+            row = STORE.claim_next(_OWNER)
+            if row is None:
+                _wakeup.wait(timeout=5)
+                _wakeup.clear()
+                continue
+            _run_job(row)
+        except Exception as exc:
+            # erro fora do processamento (payload inválido, SQLite travado...):
+            # o worker não pode morrer, senão a fila perde capacidade para sempre
+            print("❌ Erro no worker de ingestão:", exc)
+            if row is not None:
+                try:
+                    STORE.finish(row["id"], "failed", error=f"{type(exc).__name__}: {exc}")
+                except Exception as finish_exc:
+                    # sem heartbeat, o job volta para a fila por _requeue_stale_jobs
+                    print(f"❌ Não foi possível marcar o job {row['id']} como falho:", finish_exc)
+            time.sleep(1)
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(INGEST_HEARTBEAT_SECONDS)
+        try:
+            STORE.heartbeat(list(_active))
+            _requeue_stale_jobs()
+        except Exception as exc:
+            print("❌ Erro no heartbeat dos jobs de ingestão:", exc)
+
+
+def _requeue_stale_jobs():
+    """Jobs de um processo que caiu (sem heartbeat) voltam para a fila."""
+    resumed = STORE.requeue_stale(time.time() - 3 * INGEST_HEARTBEAT_SECONDS)
+    if resumed:
+        print(f"Retomando {resumed} job(s) de ingestão interrompido(s)")
+        _wakeup.set()
+
+
+def _expire_failed_jobs():
+    """Apaga os arquivos de jobs que falharam há mais de INGEST_FAILED_RETENTION_HOURS."""
+    expired = STORE.expire_failed(time.time() - INGEST_FAILED_RETENTION_HOURS * 3600)
+    for job_id in expired:
+        shutil.rmtree(JOBS_DIR / job_id, ignore_errors=True)
+    if expired:
+        print(f"🧹 Arquivos de {len(expired)} job(s) de ingestão com falha removidos")
+
+
+def _run_job(row: sqlite3.Row):
+    job_id = row["id"]
+    _active.add(job_id)
+    try:
+        _process_job(row)
+    finally:
+        _active.discard(job_id)
+
+
+def _process_job(row: sqlite3.Row):
+    job_id = row["id"]
+    payload = json.loads(row["payload"])
+    progress = _JobProgress(STORE, job_id)
+    uploads: List[UploadFile] = []
+    try:
+        for f in payload["files"]:
+            uploads.append(UploadFile(file=open(f["path"], "rb"), filename=f["name"]))
+        process_and_index(
+            row["course_id"],
+            row["lecture_id"],
+            uploads,
+            payload["raw_texts"],
+            payload["links"],
+            progress=progress,
+        )
+    except Exception as exc:
+        print(f"❌ Job de ingestão {job_id} falhou:", exc)
+        progress.flush()
+        STORE.finish(job_id, "failed", error=str(exc))
+        _expire_failed_jobs()
+        return
+    finally:
+        for up in uploads:
+            up.file.close()
+    progress.flush()
+    STORE.finish(job_id, "done")
+    shutil.rmtree(JOBS_DIR / job_id, ignore_errors=True)
+
+
+async def submit_job(
+    course_id: str,
+    lecture_id: Optional[str],
+    files: List[UploadFile],
+    raw_texts: List[str],
+    links: List[str],
+) -> str:
+    """Salva os arquivos enviados em disco, enfileira o job e devolve seu id."""
+    job_id = uuid4().hex
+    job_dir = JOBS_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    saved = []
+    for i, up in enumerate(files):
+        dest = job_dir / f"{i}_{Path(up.filename).name}"
+        async with aiofiles.open(dest, "wb") as out:
+            while chunk := await up.read(1024 * 1024):
+                await out.write(chunk)
+        await up.close()
+        saved.append({"name": up.filename, "path": str(dest)})
+
+    STORE.create(
+        job_id,
+        course_id,
+        lecture_id,
+        {"files": saved, "raw_texts": raw_texts, "links": links},
+    )
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return STORE.get(job_id)
+
+
+def retry_job(job_id: str) -> bool:
+    """Reenfileira um job com status 'failed'; False se ele não existe ou não falhou."""
+    if not STORE.retry(job_id):
+        return False
+    start_workers()
+    _wakeup.set()
+    return True
@@ -0,0 +1,88 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+
+class JsonArrayStream:
+    """
+    Parser incremental de um array JSON de topo: recebe o texto em pedaços
+    (`feed`) e devolve cada elemento assim que ele fecha. Texto antes do `[`
+    (cercas ```json, espaços) é ignorado; um elemento que ficou pela metade no
+    fim do stream é descartado, os completos já foram entregues. Um elemento
+    malformado é logado e pulado (contado em `skipped`) sem parar o parser.
+    """
+
+    def __init__(self):
+        self._buf: List[str] = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.skipped = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> List[Any]:
+        items = []
+        for ch in text:
+            if self._finished:
+                break
+            if not self._started:
+                self._started = ch == "["
+                continue
+
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0 and ch in ",]":
+                item = "".join(self._buf).strip()
+                self._buf.clear()
+                if item:
+                    try:
+                        items.append(json.loads(item))
+                    except json.JSONDecodeError as e:
+                        self.skipped += 1
+                        print(f"⚠️ Elemento JSON malformado ignorado ({e}): {item[:200]!r}")
+                self._finished = ch == "]"
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+            self._buf.append(ch)
+        return items
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Itera os elementos de um array JSON que chega em pedaços de texto."""
+    parser = JsonArrayStream()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
+    if not parser.finished:
+        print("⚠️ Stream JSON terminou antes do fim do array; mantendo os elementos completos")
+
+
+async def aiter_json_array(chunks: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """Versão assíncrona de `iter_json_array`."""
+    parser = JsonArrayStream()
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+        if parser.finished:
+            return
+    if not parser.finished:
+        print("⚠️ Stream JSON terminou antes do fim do array; mantendo os elementos completos")
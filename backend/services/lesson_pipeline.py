@@ -0,0 +1,212 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from sqlalchemy import select
+
+from models.database import SessionLocal
+from models.file import File
+from models.lesson import Lesson
+from services.course_manager import get_lesson, save_file_db
+
+# transcrição → shorts (segmentação + cortes) → thread; cada estágio grava seu
+# resultado em `Lesson.processing`, então um reinício continua do primeiro que faltar.
+STAGES = ("transcription", "shorts", "threads")
+# estágios de versões anteriores, em que segmentação e cortes eram separados
+LEGACY_STAGES = ("segmentation", "clipping")
+PENDING = "queued"
+DONE = "done"
+FAILED = "failed"
+
+LESSON_WORKERS = int(os.getenv("LESSON_WORKERS", "1"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots: Optional[asyncio.Semaphore] = None
+_running: dict[int, asyncio.Task] = {}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=LESSON_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+# --------------------------------------------------------------------------
+# Estágios (rodam nos processos do pool; entradas e saídas são JSON puro)
+# --------------------------------------------------------------------------
+
+def _stage_transcription(video_path: str) -> dict:
+    from app.shorts_agent.services import transcript_key, transcribe_video
+
+    # a transcrição com timestamps por palavra fica no ARTIFACTS (pelo hash do
+    # vídeo); na aula vai só o texto corrido e um resumo
+    segments = transcribe_video(video_path)
+    return {
+        "artifact": transcript_key(video_path),
+        "segments": len(segments),
+        "words": sum(len(s.words or []) for s in segments),
+        "audio_seconds": round(segments[-1].end, 3) if segments else 0.0,
+        "text": "\n".join(s.text for s in segments),
+    }
+
+
+def _stage_shorts(video_path: str, course_id: int, lesson_id: int, segments: Optional[list] = None) -> dict:
+    from app.shorts_agent.services import iter_segment_transcript, render_segments, transcribe_video
+
+    if segments is None:
+        # o ffmpeg corta cada short assim que o Gemini o fecha; a segmentação
+        # completa fica no cache de artefatos, então um retry não chama o Gemini
+        # de novo. Janela sem resultado levanta SegmentationIncomplete: o estágio
+        # falha em vez de marcar como concluída uma segmentação com buracos.
+        received = []
+
+        def _segments():
+            for segment in iter_segment_transcript(transcribe_video(video_path), video_path):
+                received.append(list(segment))
+                yield segment
+
+        clips = render_segments(video_path, _segments(), course_id, lesson_id)
+        return {"segments": received, "clips": clips}
+
+    return {"segments": segments, "clips": render_segments(video_path, segments, course_id, lesson_id)}
+
+
+def _stage_threads(transcript_text: str) -> dict:
+    from app.threads_agent.agent import generate_thread_from_transcript
+
+    return {"messages": generate_thread_from_transcript(transcript_text)}
+
+
+def _stage_call(stage: str, lesson: Lesson):
+    done = lesson.processing
+    if stage == "transcription":
+        return _stage_transcription, (lesson.video,)
+    if stage == "shorts":
+        # aula que parou entre os antigos estágios de segmentação e cortes
+        segments = done["segmentation"]["segments"] if "segmentation" in done else None
+        return _stage_shorts, (lesson.video, lesson.course_id, lesson.id, segments)
+    if stage == "threads":
+        return _stage_threads, (lesson.video_transcript or "",)
+    raise ValueError(f"Estágio desconhecido: {stage}")
+
+
+async def _apply(db, lesson: Lesson, stage: str, output: dict):
+    """Reflete o resultado do estágio nas colunas/tabelas que o resto da API lê."""
+    if stage == "transcription":
+        lesson.video_transcript = output.pop("text")
+    elif stage == "shorts":
+        # um retry refaz o estágio inteiro: não duplica os shorts já gravados
+        result = await db.execute(
+            select(File.path).where(File.lesson_id == lesson.id, File.category == "shorts")
+        )
+        saved = set(result.scalars().all())
+        for clip in output["clips"]:
+            if clip["short_path"] in saved:
+                continue
+            await save_file_db(
+                db,
+                name=os.path.basename(clip["short_path"]),
+                path=clip["short_path"],
+                mime="video/mp4",
+                course_id=lesson.course_id,
+                lesson_id=lesson.id,
+                category="shorts",
+            )
+    elif stage == "threads":
+        lesson.thread = {"messages": output["messages"]}
+
+
+# --------------------------------------------------------------------------
+# Orquestração (no event loop da API)
+# --------------------------------------------------------------------------
+
+async def _run(lesson_id: int):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(LESSON_WORKERS)
+
+    async with _slots, SessionLocal() as db:
+        lesson = await get_lesson(db, lesson_id)
+        if lesson is None:
+            return
+        if lesson.processing is None:
+            lesson.processing = {}
+        elif all(stage in lesson.processing for stage in LEGACY_STAGES):
+            lesson.processing = {
+                **lesson.processing,
+                "shorts": {
+                    "segments": lesson.processing["segmentation"]["segments"],
+                    "clips": lesson.processing["clipping"]["clips"],
+                },
+            }
+        loop = asyncio.get_running_loop()
+        try:
+            for stage in STAGES:
+                if stage in lesson.processing:
+                    continue
+                lesson.processing_status = stage
+                await db.commit()
+
+                fn, args = _stage_call(stage, lesson)
+                started = time.perf_counter()
+                output = await loop.run_in_executor(_get_pool(), fn, *args)
+                output["seconds"] = round(time.perf_counter() - started, 3)
+
+                await _apply(db, lesson, stage, output)
+                lesson.processing[stage] = output
+                await db.commit()
+                print(f"🎬 Aula {lesson_id}: {stage} concluído em {output['seconds']}s")
+            lesson.processing_status = DONE
+            lesson.processing_error = None
+        except Exception as exc:
+            print(f"❌ Aula {lesson_id}: falha no estágio {lesson.processing_status}:", exc)
+            lesson.processing_status = FAILED
+            lesson.processing_error = f"{type(exc).__name__}: {exc}"
+        await db.commit()
+
+
+def enqueue_lesson(lesson_id: int) -> asyncio.Task:
+    """Agenda o pipeline da aula no loop atual (um por aula)."""
+    task = _running.get(lesson_id)
+    if task is None or task.done():
+        task = asyncio.get_running_loop().create_task(_run(lesson_id))
+        _running[lesson_id] = task
+        task.add_done_callback(lambda _: _running.pop(lesson_id, None))
+    return task
+
+
+async def resume_pending_lessons():
+    """Hook de startup: retoma aulas que estavam na fila ou no meio de um estágio."""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(Lesson.id).where(Lesson.processing_status.in_((PENDING, *STAGES, *LEGACY_STAGES)))
+        )
+        ids = result.scalars().all()
+    for lesson_id in ids:
+        enqueue_lesson(lesson_id)
+    if ids:
+        print(f"Retomando processamento de {len(ids)} aula(s)")
+
+
+def processing_summary(lesson: Lesson) -> dict:
+    """Progresso sem os payloads dos estágios (segmentos, cortes)."""
+    done = lesson.processing or {}
+    return {
+        "lesson_id": lesson.id,
+        "status": lesson.processing_status,
+        "stages": {
+            stage: {"done": stage in done, "seconds": done.get(stage, {}).get("seconds")}
+            for stage in STAGES
+        },
+        "error": lesson.processing_error,
+    }
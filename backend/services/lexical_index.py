@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+LEXICAL_INDEX_PATH = Path(os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index.sqlite3"))
+
+# Palavras que aparecem em quase toda pergunta e só deixam o MATCH mais lento.
+STOPWORDS = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela para pra
+    com sem e ou que se como qual quais quando onde porque porquê é ser são foi era isso
+    isto esse essa este esta ele ela eles elas eu você vocês me te lhe ao aos à às mais
+    muito pouco the of and to in is what how
+    """.split()
+)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos, como o tokenizer do FTS5."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def query_terms(text: str) -> list[str]:
+    """Termos da pergunta (minúsculos, sem stopwords, sem repetir, na ordem)."""
+    seen: dict[str, None] = {}
+    for term in _TOKEN.findall(text.lower()):
+        if len(term) > 1 and term not in STOPWORDS:
+            seen.setdefault(term)
+    return list(seen)
+
+
+def term_weight(term: str) -> float:
+    """Termos raros (identificadores, números, palavras longas) valem o dobro."""
+    return 2.0 if (len(term) >= 8 or "_" in term or any(c.isdigit() for c in term)) else 1.0
+
+
+class LexicalIndex:
+    """
+    Índice invertido local (SQLite FTS5, ranking BM25) dos mesmos chunks do
+    Chroma, para achar termos exatos (nomes de fórmula, identificadores de
+    código) que a busca vetorial deixa passar. É mantido por `process_and_index`
+    junto com as escritas no Chroma.
+    """
+
+    def __init__(self, path: Path = LEXICAL_INDEX_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                    chunk_id UNINDEXED,
+                    collection UNINDEXED,
+                    text,
+                    meta UNINDEXED,
+                    tokenize = "unicode61 remove_diacritics 2 tokenchars '_'"
+                );
+                CREATE TABLE IF NOT EXISTS collections (
+                    name  TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+
+    def _recount(self, collection: str):
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+        ).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO collections (name, count) VALUES (?, ?)", (collection, count)
+        )
+
+    def add(self, collection: str, ids: list[str], docs: list[str], metas: list[dict]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ? AND collection = ?",
+                [(chunk_id, collection) for chunk_id in ids],
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (chunk_id, collection, text, meta) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk_id, collection, doc, json.dumps(meta, ensure_ascii=False))
+                    for chunk_id, doc, meta in zip(ids, docs, metas)
+                ],
+            )
+            self._recount(collection)
+            self._conn.commit()
+
+    def delete(self, collection: str, ids: list[str]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ? AND collection = ?",
+                [(chunk_id, collection) for chunk_id in ids],
+            )
+            self._recount(collection)
+            self._conn.commit()
+
+    def count(self, collection: str) -> Optional[int]:
+        """Chunks indexados da coleção, ou None se ela nunca passou por aqui."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT count FROM collections WHERE name = ?", (collection,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def ensure_built(self, collection: str, source):
+        """
+        Copia a coleção do Chroma (`source`) para o índice se ela nunca passou
+        por aqui, ou seja, foi indexada antes de existir o índice léxico.
+        """
+        if self.count(collection) is not None:
+            return
+        with self._build_lock:
+            if self.count(collection) is not None:
+                return
+            total, offset = source.count(), 0
+            while offset < total:
+                page = source.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+                if not page["ids"]:
+                    break
+                self.add(collection, page["ids"], page["documents"], page["metadatas"])
+                offset += len(page["ids"])
+            if not offset:
+                self.add(collection, [], [], [])
+            print(f"🔤 Índice léxico de {collection} reconstruído ({offset} chunks)")
+
+    def search(self, collection: str, query: str, k: int) -> list[tuple[str, str, dict, float]]:
+        """Top-k por BM25: (chunk_id, texto, metadados, score — maior é melhor)."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, text, meta, bm25(chunks) AS rank FROM chunks "
+                "WHERE chunks MATCH ? AND collection = ? ORDER BY rank LIMIT ?",
+                (match, collection, k),
+            ).fetchall()
+        return [(chunk_id, text, json.loads(meta), -rank) for chunk_id, text, meta, rank in rows]
+
+
+LEXICAL = LexicalIndex()
@@ -0,0 +1,321 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from google.api_core import exceptions as gexc
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from services.background_loop import BackgroundLoop
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "models/gemini-2.5-pro")
+# Chamadas simultâneas ao provedor no processo inteiro e por modelo.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_PER_MODEL_CONCURRENCY = int(os.getenv("LLM_PER_MODEL_CONCURRENCY", "4"))
+
+RETRYABLE = (
+    gexc.ResourceExhausted,
+    gexc.ServiceUnavailable,
+    gexc.InternalServerError,
+    gexc.DeadlineExceeded,
+    asyncio.TimeoutError,
+)
+
+_RETRY = dict(
+    retry=retry_if_exception_type(RETRYABLE),
+    wait=wait_random_exponential(multiplier=2, max=60),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+@dataclass
+class LLMResult:
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+
+class LLMStreamInterrupted(RuntimeError):
+    """Stream caiu depois de já ter entregue texto; não dá para repetir sem duplicar."""
+
+
+class GeminiBackend:
+    """Backend real: google-generativeai com as chamadas assíncronas do SDK."""
+
+    def __init__(self):
+        from google import generativeai as genai
+        from app.config import GOOGLE_API_KEY
+
+        genai.configure(api_key=GOOGLE_API_KEY)
+        self._genai = genai
+
+    def _model(self, model: str, system: Optional[str]):
+        return self._genai.GenerativeModel(model, system_instruction=system)
+
+    @staticmethod
+    def _usage(response) -> tuple[int, int]:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return 0, 0
+        return usage.prompt_token_count or 0, usage.candidates_token_count or 0
+
+    async def generate(self, model: str, contents: Any, system: Optional[str], config: dict) -> LLMResult:
+        response = await self._model(model, system).generate_content_async(
+            contents, generation_config=config or None
+        )
+        return LLMResult(response.text, *self._usage(response))
+
+    async def stream(self, model: str, contents: Any, system: Optional[str], config: dict) -> AsyncIterator[LLMResult]:
+        response = await self._model(model, system).generate_content_async(
+            contents, generation_config=config or None, stream=True
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:  # pedaço só com finish_reason/safety
+                text = ""
+            yield LLMResult(text, *self._usage(chunk))
+
+
+class _ModelMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latencies: deque = deque(maxlen=512)
+        self.first_token: deque = deque(maxlen=512)
+
+    def record(self, seconds: float, result: LLMResult, first_token: Optional[float] = None):
+        self.calls += 1
+        self.prompt_tokens += result.prompt_tokens
+        self.output_tokens += result.output_tokens
+        self.latencies.append(seconds)
+        if first_token is not None:
+            self.first_token.append(first_token)
+
+    @staticmethod
+    def _pct(values, q: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_p50": self._pct(self.latencies, 0.5),
+            "latency_p95": self._pct(self.latencies, 0.95),
+            "first_token_p50": self._pct(self.first_token, 0.5),
+        }
+
+
+_END = object()
+
+
+class LLMGateway:
+    """
+    Ponto único de acesso ao LLM para os agentes (shorts, threads, chat).
+
+    Tudo roda num event loop próprio (BackgroundLoop), então rotas async,
+    threads e workers síncronos dividem os mesmos limites: um semáforo global e
+    um por modelo. Prompts idênticos em voo ao mesmo tempo viram uma chamada só,
+    falhas transitórias são repetidas com backoff e cada chamada registra
+    latência e tokens em `stats()`.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        concurrency: int = LLM_CONCURRENCY,
+        per_model: int = LLM_PER_MODEL_CONCURRENCY,
+        retry: Optional[dict] = None,
+    ):
+        self._backend = backend
+        self.concurrency = concurrency
+        self.per_model = per_model
+        self._retry = retry or _RETRY
+        self._runner = BackgroundLoop("llm-gateway")
+        self._global: Optional[asyncio.Semaphore] = None
+        self._models: dict[str, asyncio.Semaphore] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._metrics: dict[str, _ModelMetrics] = defaultdict(_ModelMetrics)
+        self._recent: deque = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = GeminiBackend()
+            return self._backend
+
+    def set_backend(self, backend):
+        """Troca o backend (testes e benchmarks usam um LLM falso local)."""
+        with self._lock:
+            self._backend = backend
+
+    # ------------------------------------------------------------------ #
+    # Internos (sempre no loop do gateway)
+    # ------------------------------------------------------------------ #
+
+    def _slots(self, model: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.concurrency)
+        if model not in self._models:
+            self._models[model] = asyncio.Semaphore(self.per_model)
+        return self._global, self._models[model]
+
+    def _log(self, model: str, seconds: float, result: Optional[LLMResult], **extra):
+        self._recent.append(
+            {
+                "model": model,
+                "seconds": round(seconds, 3),
+                "prompt_tokens": result.prompt_tokens if result else 0,
+                "output_tokens": result.output_tokens if result else 0,
+                **extra,
+            }
+        )
+
+    @staticmethod
+    def _key(model: str, contents: Any, system: Optional[str], config: dict) -> str:
+        raw = json.dumps([model, system, contents, config], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def _call(self, model: str, contents: Any, system: Optional[str], config: dict) -> LLMResult:
+        metrics = self._metrics[model]
+        glob, per_model = self._slots(model)
+        started = time.perf_counter()
+        try:
+            async for attempt in AsyncRetrying(**self._retry):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        metrics.retries += 1
+                    async with glob, per_model:
+                        result = await self.backend.generate(model, contents, system, config)
+        except Exception:
+            metrics.errors += 1
+            self._log(model, time.perf_counter() - started, None, error=True)
+            raise
+        seconds = time.perf_counter() - started
+        metrics.record(seconds, result)
+        self._log(model, seconds, result)
+        return result
+
+    async def _generate(self, model: str, contents: Any, system: Optional[str], config: dict) -> LLMResult:
+        key = self._key(model, contents, system, config)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(model, contents, system, config))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._metrics[model].coalesced += 1
+        # shield: se um dos interessados desiste, a chamada continua para os outros
+        return await asyncio.shield(task)
+
+    async def _pump(self, model: str, contents: Any, system: Optional[str], config: dict, emit: Callable):
+        metrics = self._metrics[model]
+        glob, per_model = self._slots(model)
+        started = time.perf_counter()
+        first_token = None
+        last = LLMResult("")
+        try:
+            async for attempt in AsyncRetrying(**self._retry):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        metrics.retries += 1
+                    async with glob, per_model:
+                        try:
+                            async for delta in self.backend.stream(model, contents, system, config):
+                                last = delta
+                                if delta.text:
+                                    if first_token is None:
+                                        first_token = time.perf_counter() - started
+                                    emit(delta.text)
+                        except RETRYABLE as exc:
+                            if first_token is not None:
+                                raise LLMStreamInterrupted(str(exc)) from exc
+                            raise
+        except BaseException as exc:
+            metrics.errors += 1
+            self._log(model, time.perf_counter() - started, None, error=True, stream=True)
+            emit(exc)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            return
+        seconds = time.perf_counter() - started
+        metrics.record(seconds, last, first_token)
+        self._log(model, seconds, last, stream=True, first_token=round(first_token or 0, 3))
+        emit(_END)
+
+    # ------------------------------------------------------------------ #
+    # API pública
+    # ------------------------------------------------------------------ #
+
+    async def agenerate(self, contents: Any, model: str = DEFAULT_MODEL, system: Optional[str] = None, **config) -> str:
+        """Gera o texto completo sem bloquear o loop de quem chama."""
+        result = await self._runner.arun(self._generate(model, contents, system, config))
+        return result.text
+
+    def generate(self, contents: Any, model: str = DEFAULT_MODEL, system: Optional[str] = None, **config) -> str:
+        """Versão síncrona de `agenerate`, para workers e threads."""
+        return self._runner.run(self._generate(model, contents, system, config)).text
+
+    async def astream(
+        self, contents: Any, model: str = DEFAULT_MODEL, system: Optional[str] = None, **config
+    ) -> AsyncIterator[str]:
+        """Entrega o texto em pedaços, à medida que o modelo gera."""
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        emit = lambda item: loop.call_soon_threadsafe(items.put_nowait, item)
+        future = asyncio.run_coroutine_threadsafe(
+            self._pump(model, contents, system, config, emit), self._runner.loop
+        )
+        try:
+            while (item := await items.get()) is not _END:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def stream(self, contents: Any, model: str = DEFAULT_MODEL, system: Optional[str] = None, **config) -> Iterator[str]:
+        """Versão síncrona de `astream`."""
+        items: queue.Queue = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._pump(model, contents, system, config, items.put), self._runner.loop
+        )
+        try:
+            while (item := items.get()) is not _END:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "per_model": self.per_model,
+            "inflight": len(self._inflight),
+            "models": {model: m.snapshot() for model, m in list(self._metrics.items())},
+            "recent": list(self._recent),
+        }
+
+
+GATEWAY = LLMGateway()
@@ -0,0 +1,97 @@
+"""
+Extração de texto de PDFs em paralelo.
+
+Módulo propositalmente leve (só pypdf): os workers do pool são processos
+`spawn` e importam apenas isto, não Chroma/embeddings.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Iterator, Union
+
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# PDFs pequenos não compensam o custo de abrir o arquivo em outro processo.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _extract_range(path: str, start: int, end: int) -> list[str]:
+    # com um arquivo aberto o pypdf lê só os objetos das páginas da faixa; com o
+    # caminho ele carregaria o PDF inteiro em memória em cada worker
+    with open(path, "rb") as fh:
+        rdr = PdfReader(fh)
+        return [rdr.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def count_pages(path: str) -> int:
+    """Nº de páginas lido da árvore de páginas, sem carregar nem extrair o PDF."""
+    with open(path, "rb") as fh:
+        return len(PdfReader(fh).pages)
+
+
+def _iter_pages_inline(fh: BinaryIO) -> Iterator[tuple[int, str]]:
+    for i, page in enumerate(PdfReader(fh).pages):
+        yield i + 1, page.extract_text() or ""
+
+
+def iter_pdf_pages(source: Union[str, BinaryIO]) -> Iterator[tuple[int, str]]:
+    """
+    Gera (número da página começando em 1, texto) na ordem do documento.
+
+    Com um caminho em disco e páginas suficientes, o PDF é dividido em faixas de
+    `PAGES_PER_TASK` páginas extraídas no pool de processos; no máximo
+    2 × `PDF_WORKERS` faixas ficam em voo, para não acumular texto em memória.
+    """
+    if not isinstance(source, str):
+        yield from _iter_pages_inline(source)
+        return
+    total = count_pages(source)
+    if total < PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+        with open(source, "rb") as fh:
+            yield from _iter_pages_inline(fh)
+        return
+
+    pool = _get_pool()
+    ranges = deque((s, min(s + PAGES_PER_TASK, total)) for s in range(0, total, PAGES_PER_TASK))
+    in_flight: deque = deque()
+
+    def _submit():
+        while ranges and len(in_flight) < 2 * PDF_WORKERS:
+            start, end = ranges.popleft()
+            in_flight.append((start, pool.submit(_extract_range, source, start, end)))
+
+    _submit()
+    try:
+        while in_flight:
+            start, fut = in_flight.popleft()
+            texts = fut.result()
+            _submit()
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+    finally:
+        for _, fut in in_flight:
+            fut.cancel()
+
+
+def pdf_bytes_to_text(data: bytes) -> str:
+    """Texto de um PDF em memória (links que apontam para PDFs)."""
+    return "\n".join(text for _, text in iter_pdf_pages(BytesIO(data)))
@@ -43,8 +43,16 @@ class LessonOut(BaseModel):
     video: Optional[str] = None
     course_id: int
     thread: Optional[dict] = None
+    processing_status: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class LessonProcessingOut(BaseModel):
+    lesson_id: int
+    status: Optional[str] = None
+    stages: dict = {}
+    error: Optional[str] = None
     
 class LessonIn(BaseModel):
     title: constr(strip_whitespace=True, min_length=1)
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.background_loop import BackgroundLoop
+
+FETCH_CACHE_DIR = Path(os.getenv("FETCH_CACHE_DIR", "data/fetch_cache"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "32"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "4"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+HTML_WORKERS = int(os.getenv("HTML_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+_RUNNER = BackgroundLoop("link-fetcher")
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def html_to_text(html: str) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return soup.get_text(" ", strip=True)
+
+
+def _pdf_to_text(data: bytes) -> str:
+    from services.pdf_extract import pdf_bytes_to_text
+
+    return pdf_bytes_to_text(data)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=HTML_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _get_client() -> httpx.AsyncClient:
+    # só é chamado dentro do loop de fundo, então não precisa de lock
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=FETCH_CONCURRENCY,
+                max_keepalive_connections=FETCH_CONCURRENCY,
+            ),
+            headers={"User-Agent": "camufy-ingest/0.1"},
+        )
+    return _client
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc.lower()
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(FETCH_PER_HOST)
+    return sem
+
+
+class FetchCache:
+    """
+    Cache em disco para GET condicional: guarda o texto já extraído de cada URL
+    junto com ETag/Last-Modified; um 304 devolve o texto sem baixar nem parsear.
+    """
+
+    def __init__(self, root: Path = FETCH_CACHE_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / f"{key}.json", self.root / f"{key}.txt"
+
+    def get(self, url: str) -> Optional[tuple[dict, str]]:
+        meta_path, text_path = self._paths(url)
+        try:
+            return json.loads(meta_path.read_text("utf-8")), text_path.read_text("utf-8")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url: str, headers: httpx.Headers, text: str):
+        meta_path, text_path = self._paths(url)
+        text_path.write_text(text, "utf-8")
+        meta_path.write_text(
+            json.dumps(
+                {
+                    "url": url,
+                    "etag": headers.get("etag"),
+                    "last_modified": headers.get("last-modified"),
+                    "fetched_at": time.time(),
+                }
+            ),
+            "utf-8",
+        )
+
+
+FETCH_CACHE = FetchCache()
+
+
+async def _fetch_one(url: str) -> str:
+    cached = FETCH_CACHE.get(url)
+    headers = {}
+    if cached:
+        meta, _ = cached
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    async with _host_limit(url):
+        async with _get_client().stream("GET", url, headers=headers) as resp:
+            if resp.status_code == 304 and cached:
+                return cached[1]
+            resp.raise_for_status()
+            # decide pelo cabeçalho antes de baixar: imagem/zip/vídeo não viram texto
+            content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+            is_pdf = content_type == "application/pdf"
+            is_html = not content_type or "html" in content_type
+            if not (is_pdf or is_html or content_type.startswith("text/")):
+                raise ValueError(f"Tipo de conteúdo não suportado: {content_type}")
+            body = bytearray()
+            async for part in resp.aiter_bytes():
+                body.extend(part)
+                if len(body) > FETCH_MAX_BYTES:
+                    raise ValueError(f"Resposta maior que {FETCH_MAX_BYTES} bytes")
+            encoding = resp.encoding or "utf-8"
+
+    loop = asyncio.get_running_loop()
+    if is_pdf:
+        text = await loop.run_in_executor(_get_pool(), _pdf_to_text, bytes(body))
+    elif is_html:
+        text = await loop.run_in_executor(_get_pool(), html_to_text, body.decode(encoding, errors="replace"))
+    else:
+        text = body.decode(encoding, errors="replace")
+    FETCH_CACHE.put(url, resp.headers, text)
+    return text
+
+
+async def _fetch_all(urls: list[str]) -> list[tuple[str, Optional[str]]]:
+    async def _safe(url):
+        try:
+            return url, await _fetch_one(url)
+        except Exception as exc:
+            print(f"⚠️ Falha ao buscar {url}:", exc)
+            return url, None
+
+    return await asyncio.gather(*(_safe(u) for u in urls))
+
+
+def fetch_texts(urls: Iterable[str]) -> list[tuple[str, Optional[str]]]:
+    """
+    Baixa as URLs em paralelo no cliente HTTP compartilhado e devolve
+    (url, texto) na mesma ordem. HTML e PDF viram texto, `text/*` entra como
+    veio; texto é None quando a busca falhou ou o tipo não é suportado.
+    """
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    if not urls:
+        return []
+    return _RUNNER.run(_fetch_all(urls))
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Os stores locais (SQLite, caches em disco) são criados no import dos módulos;
+# nos testes eles vão para um diretório temporário em vez de data/.
+_DATA = Path(tempfile.mkdtemp(prefix="camufy-tests-"))
+for var, name in {
+    "FETCH_CACHE_DIR": "fetch_cache",
+    "EMBED_CACHE_PATH": "embed_cache.sqlite3",
+    "LEXICAL_INDEX_PATH": "lexical_index.sqlite3",
+    "INDEX_REGISTRY_PATH": "index_fingerprints.sqlite3",
+    "INGEST_JOBS_DB": "ingest_jobs.sqlite3",
+    "INGEST_JOBS_DIR": "ingest_jobs",
+    "ARTIFACT_CACHE_PATH": "video_artifacts.sqlite3",
+}.items():
+    os.environ.setdefault(var, str(_DATA / name))
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
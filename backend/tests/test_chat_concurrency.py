@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.agentic_chat import crew
+from benchmarks.fake_llm import FakeChatBackend, fake_retrieval
+from services.llm_gateway import GATEWAY
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    backend = FakeChatBackend(latency=0.02, jitter=0.08)
+    GATEWAY.set_backend(backend)
+    monkeypatch.setattr(crew, "retrieve_context", fake_retrieval(0.01))
+    yield backend
+    GATEWAY.set_backend(None)
+
+
+async def _ask(question: str):
+    answer, insight, summary = await crew.run_chat(question)
+    return answer, insight, summary, crew.get_reasoning_steps(), crew.get_timings()
+
+
+@pytest.mark.parametrize("mode", ["parallel", "combined"])
+def test_concurrent_chats_do_not_cross(fake_llm, monkeypatch, mode):
+    monkeypatch.setattr(crew, "CHAT_MODE", mode)
+    questions = [f"pergunta {i} sobre tema {i}" for i in range(12)]
+
+    async def main():
+        return await asyncio.gather(*(_ask(q) for q in questions))
+
+    results = asyncio.run(main())
+
+    for question, (answer, insight, summary, reasoning, timings) in zip(questions, results):
+        assert answer == f"resposta para {question}"
+        assert insight["tema"] == f"tema de {question}"
+        if mode == "parallel":
+            assert summary == f"resumo de [{answer}]"
+        else:
+            assert summary == f"resumo de {question}"
+        # o reasoning de cada conversa só tem os passos dela, uma vez cada
+        assert reasoning[0].startswith(f"🚀 Iniciando análise da pergunta: '{question}")
+        assert sum(step.startswith("🚀") for step in reasoning) == 1
+        assert reasoning[-1] == "🎯 Processo concluído"
+        assert sum(step == "✅ Resposta gerada com sucesso" for step in reasoning) == 1
+        assert "total" in timings and "retrieval" in timings
@@ -0,0 +1,21 @@
+from services.json_stream import JsonArrayStream, iter_json_array
+
+
+def test_elements_split_across_chunks():
+    text = '```json\n[{"a": "x, ]"}, {"b": [1, 2]}, 3]'
+    chunks = [text[i : i + 4] for i in range(0, len(text), 4)]
+    assert list(iter_json_array(chunks)) == [{"a": "x, ]"}, {"b": [1, 2]}, 3]
+
+
+def test_malformed_element_is_skipped():
+    parser = JsonArrayStream()
+    items = parser.feed('[{"start": 1}, {"start": 2,}, {"start": 3}]')
+    assert items == [{"start": 1}, {"start": 3}]
+    assert parser.skipped == 1
+    assert parser.finished
+
+
+def test_truncated_stream_keeps_complete_elements():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"start": 1}, {"start": ') == [{"start": 1}]
+    assert not parser.finished
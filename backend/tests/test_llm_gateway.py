@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from google.api_core import exceptions as gexc
+from tenacity import wait_none
+
+from services.llm_gateway import _RETRY, LLMGateway, LLMResult, LLMStreamInterrupted
+
+
+class FakeBackend:
+    """Backend local: conta chamadas, mede o pico de concorrência e falha sob demanda."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self.peak_total = 0
+        self.failures = {}  # contents → exceções a levantar antes de responder
+
+    def _enter(self, model):
+        self.active[model] = self.active.get(model, 0) + 1
+        self.peak[model] = max(self.peak.get(model, 0), self.active[model])
+        self.peak_total = max(self.peak_total, sum(self.active.values()))
+
+    def _leave(self, model):
+        self.active[model] -= 1
+
+    async def generate(self, model, contents, system, config):
+        self.calls.append((model, contents))
+        self._enter(model)
+        try:
+            await asyncio.sleep(self.delay)
+            pending = self.failures.get(contents)
+            if pending:
+                raise pending.pop(0)
+            return LLMResult(f"{model}|{system}|{contents}", prompt_tokens=3, output_tokens=2)
+        finally:
+            self._leave(model)
+
+    async def stream(self, model, contents, system, config):
+        self.calls.append((model, contents))
+        pending = self.failures.get(contents)
+        for i in range(4):
+            await asyncio.sleep(0.005)
+            if pending and i == 2:
+                raise pending.pop(0)
+            yield LLMResult(f"<{i}>", prompt_tokens=3, output_tokens=i + 1)
+
+
+def _gateway(backend, concurrency=8, per_model=4):
+    return LLMGateway(backend, concurrency=concurrency, per_model=per_model, retry={**_RETRY, "wait": wait_none()})
+
+
+def test_identical_inflight_prompts_are_coalesced():
+    backend = FakeBackend()
+    gateway = _gateway(backend)
+
+    async def main():
+        return await asyncio.gather(*(gateway.agenerate(f"p{i % 3}", model="m", system="s") for i in range(12)))
+
+    results = asyncio.run(main())
+
+    assert results == [f"m|s|p{i % 3}" for i in range(12)]
+    assert len(backend.calls) == 3
+    assert gateway.stats()["models"]["m"]["coalesced"] == 9
+
+
+def test_global_and_per_model_limits():
+    backend = FakeBackend()
+    gateway = _gateway(backend, concurrency=3, per_model=2)
+
+    async def main():
+        await asyncio.gather(
+            *(gateway.agenerate(f"a{i}", model="a") for i in range(6)),
+            *(gateway.agenerate(f"b{i}", model="b") for i in range(6)),
+        )
+
+    asyncio.run(main())
+
+    assert len(backend.calls) == 12
+    assert backend.peak["a"] == 2 and backend.peak["b"] == 2
+    assert backend.peak_total == 3
+
+
+def test_retries_resource_exhausted():
+    backend = FakeBackend(delay=0)
+    backend.failures["quota"] = [gexc.ResourceExhausted("429"), gexc.ResourceExhausted("429")]
+    gateway = _gateway(backend)
+
+    assert gateway.generate("quota", model="m") == "m|None|quota"
+    assert len(backend.calls) == 3
+    assert gateway.stats()["models"]["m"]["retries"] == 2
+
+
+def test_non_retryable_error_is_raised_once():
+    backend = FakeBackend(delay=0)
+    backend.failures["bad"] = [gexc.InvalidArgument("prompt inválido")]
+    gateway = _gateway(backend)
+
+    with pytest.raises(gexc.InvalidArgument):
+        gateway.generate("bad", model="m")
+    assert len(backend.calls) == 1
+
+
+def test_stream_is_not_retried_after_emitting_text():
+    backend = FakeBackend()
+    backend.failures["cut"] = [gexc.ServiceUnavailable("conexão caiu")]
+    gateway = _gateway(backend)
+    received = []
+
+    with pytest.raises(LLMStreamInterrupted):
+        for text in gateway.stream("cut", model="m"):
+            received.append(text)
+
+    assert received == ["<0>", "<1>"]
+    assert len(backend.calls) == 1
+
+
+def test_stream_delivers_all_chunks():
+    gateway = _gateway(FakeBackend())
+
+    async def main():
+        return [text async for text in gateway.astream("ok", model="m")]
+
+    assert asyncio.run(main()) == ["<0>", "<1>", "<2>", "<3>"]
+    assert gateway.stats()["models"]["m"]["calls"] == 1
@@ -0,0 +1,145 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import web_fetch
+
+
+def _pdf(text: str) -> bytes:
+    """PDF mínimo de uma página com `text` em Helvetica."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class _Site:
+    """Estado do servidor local: páginas, conexões abertas e pico de requisições simultâneas."""
+
+    def __init__(self):
+        self.pages = {}
+        self.delay = 0.0
+        self.connections = set()
+        self.requests = []
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def site():
+    state = _Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, para o pool reaproveitar conexões
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with state.lock:
+                state.connections.add(self.client_address)
+                state.requests.append((self.path, self.headers.get("If-None-Match")))
+                state.active += 1
+                state.peak = max(state.peak, state.active)
+            try:
+                time.sleep(state.delay)
+                page = state.pages.get(self.path)
+                if page is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                content_type, body, etag = page
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state.base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(web_fetch, "FETCH_CACHE", web_fetch.FetchCache(tmp_path / "cache"))
+    monkeypatch.setattr(web_fetch, "_host_limits", {})
+    yield
+    # o cliente vive no loop de fundo; fecha para o próximo teste abrir conexões novas
+    if web_fetch._client is not None:
+        web_fetch._RUNNER.run(web_fetch._client.aclose())
+        web_fetch._client = None
+
+
+def test_pooled_fetch_respects_per_host_limit(site, monkeypatch):
+    monkeypatch.setattr(web_fetch, "FETCH_PER_HOST", 2)
+    site.delay = 0.05
+    for i in range(12):
+        site.pages[f"/p{i}"] = ("text/plain; charset=utf-8", f"página {i}".encode(), None)
+    urls = [f"{site.base}/p{i}" for i in range(12)]
+
+    results = web_fetch.fetch_texts(urls)
+    results += web_fetch.fetch_texts(urls)
+
+    assert [text for _, text in results] == [f"página {i}" for i in range(12)] * 2
+    assert site.peak == 2
+    # 24 requisições em no máximo 2 conexões keep-alive do cliente compartilhado
+    assert len(site.connections) <= 2
+
+
+def test_revalidates_with_etag(site):
+    site.pages["/aula"] = ("text/html", b"<html><body><p>Derivadas</p><script>x()</script></body></html>", '"v1"')
+    url = f"{site.base}/aula"
+
+    assert web_fetch.fetch_texts([url]) == [(url, "Derivadas")]
+    assert web_fetch.fetch_texts([url]) == [(url, "Derivadas")]
+    assert site.requests == [("/aula", None), ("/aula", '"v1"')]
+
+    site.pages["/aula"] = ("text/html", b"<p>Integrais</p>", '"v2"')
+    assert web_fetch.fetch_texts([url]) == [(url, "Integrais")]
+
+
+def test_content_types(site):
+    site.pages["/notas.pdf"] = ("application/pdf", _pdf("Teorema de Bayes"), None)
+    site.pages["/foto.png"] = ("image/png", b"\x89PNG\r\n\x1a\n" + bytes(64), None)
+    site.pages["/leia.md"] = ("text/markdown", "# Título".encode(), None)
+    urls = [f"{site.base}{path}" for path in ("/notas.pdf", "/foto.png", "/leia.md", "/sumiu")]
+
+    texts = dict(web_fetch.fetch_texts(urls))
+
+    assert "Teorema de Bayes" in texts[urls[0]]
+    assert texts[urls[1]] is None
+    assert texts[urls[2]] == "# Título"
+    assert texts[urls[3]] is None